@@ -1,45 +1,706 @@
 from __future__ import absolute_import
 
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
 import os
+import shutil
 import signal
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from importlib import import_module
+from multiprocessing.util import Finalize
+from unittest import SkipTest
 
 from django.conf import settings
+from django.contrib.staticfiles.handlers import StaticFilesHandler
 from django.contrib.staticfiles.testing import StaticLiveServerTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.http import HttpRequest
+from django.test import TransactionTestCase
 
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+
+from . import artifacts, displays, durations, instrumentation, profiles
+from .aio import AsyncPageElement, AsyncPageElements, AsyncSeleniumWrapper
+from .server import ServerActivity
+from .static import CachedStaticFilesHandler
+
+
+def get_worker_id():
+    """
+    Returns the number of the current parallel test worker.
+
+    This is 0 when tests aren't run in parallel, and 1, 2, etc. in the
+    worker processes of "manage.py test --parallel".
+    """
+    from django.test import runner
+
+    return runner._worker_id
+
+
+class WaitPolicy(object):
+    """
+    Determines how long waits last and how often they check their condition.
+
+    The first check is made immediately, and the interval between checks
+    starts at poll_interval and is multiplied by backoff after each
+    check, up to max_poll_interval. Waits for which a timeout isn't
+    specified use default_timeout. All timeouts are multiplied by
+    timeout_multiplier, which can be increased on slow machines.
+    """
+
+    def __init__(
+        self,
+        poll_interval=0.05,
+        backoff=1.5,
+        max_poll_interval=0.5,
+        default_timeout=10,
+        timeout_multiplier=1,
+    ):
+        self.poll_interval = poll_interval
+        self.backoff = backoff
+        self.max_poll_interval = max_poll_interval
+        self.default_timeout = default_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**getattr(settings, "SELENIUM_WAIT_POLICY", {}))
+
+    def get_timeout(self, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        return timeout * self.timeout_multiplier
+
+    async def poll_async(self, condition, timeout, negate=False, message=""):
+        """
+        Like poll(), but condition() is run in the event loop's default
+        executor, and the waiting between checks doesn't block.
+        """
+        loop = asyncio.get_running_loop()
+        end_time = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            try:
+                value = await loop.run_in_executor(None, condition)
+            except NoSuchElementException:
+                value = False
+            if bool(value) != negate:
+                return value
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(message)
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * self.backoff, self.max_poll_interval)
+
+    def poll(self, condition, timeout, negate=False, message=""):
+        """
+        Calls condition() until it returns a true value, and returns it.
+
+        If negate is True, waits until condition() returns a false value.
+        NoSuchElementException counts as a false value. If "timeout"
+        seconds (to which get_timeout() must already have been applied)
+        elapse, raises TimeoutException.
+        """
+        end_time = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            try:
+                value = condition()
+            except NoSuchElementException:
+                value = False
+            if bool(value) != negate:
+                return value
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(message)
+            time.sleep(min(interval, remaining))
+            interval = min(interval * self.backoff, self.max_poll_interval)
+
+
+# PageElement objects use the browser specified here, if any, instead of
+# PageElement.selenium. It is set by threads that run a test, or an action
+# of SeleniumTestCase.run_concurrently(), on a browser other than the main
+# one.
+_thread_local = threading.local()
+
+
+@contextmanager
+def _recording_wait(what, timeout):
+    # Records the wait if instrumentation is enabled
+    if not instrumentation.is_enabled():
+        yield
+        return
+    start = time.monotonic()
+    timed_out = False
+    try:
+        yield
+    except (TimeoutException, AssertionError):
+        timed_out = True
+        raise
+    finally:
+        instrumentation.recorder.wait(
+            what, time.monotonic() - start, timeout, timed_out
+        )
+
+
+ElementState = namedtuple("ElementState", ["exists", "displayed", "text", "attributes"])
+
+# Javascript functions used by the scripts below. locate() finds all the
+# elements that match a Selenium locator; isDisplayed() approximates
+# WebElement.is_displayed().
+JS_HELPERS = """
+var locate = function (by, value) {
+    var i, result = [], nodes, text;
+    switch (by) {
+    case "id":
+        return Array.prototype.slice.call(
+            document.querySelectorAll("#" + CSS.escape(value)));
+    case "name":
+        return Array.prototype.slice.call(
+            document.querySelectorAll('[name="' + CSS.escape(value) + '"]'));
+    case "tag name":
+        return Array.prototype.slice.call(document.getElementsByTagName(value));
+    case "class name":
+        return Array.prototype.slice.call(document.getElementsByClassName(value));
+    case "css selector":
+        return Array.prototype.slice.call(document.querySelectorAll(value));
+    case "xpath":
+        nodes = document.evaluate(value, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (i = 0; i < nodes.snapshotLength; i++) {
+            result.push(nodes.snapshotItem(i));
+        }
+        return result;
+    case "link text":
+    case "partial link text":
+        nodes = document.getElementsByTagName("a");
+        for (i = 0; i < nodes.length; i++) {
+            text = nodes[i].innerText.trim();
+            if (by === "link text" ? text === value : text.indexOf(value) >= 0) {
+                result.push(nodes[i]);
+            }
+        }
+        return result;
+    }
+    throw new Error("Unsupported locator strategy: " + by);
+};
+
+var isDisplayed = function (element) {
+    var style = window.getComputedStyle(element);
+    if (style.visibility === "hidden" || style.visibility === "collapse") {
+        return false;
+    }
+    return !!(element.offsetWidth || element.offsetHeight ||
+        element.getClientRects().length);
+};
+"""
+
+SNAPSHOT_JS = JS_HELPERS + """
+var locators = arguments[0], attributes = arguments[1];
+return locators.map(function (locator) {
+    var element = locate(locator[0], locator[1])[0], displayed, values = {};
+    if (!element) {
+        return null;
+    }
+    displayed = isDisplayed(element);
+    attributes.forEach(function (name) {
+        values[name] = element.getAttribute(name);
+    });
+    return [displayed, displayed ? element.innerText : "", values];
+});
+"""
+
+# Returns the number of elements that match a locator, or a list with the
+# text or the value of an attribute of each of them.
+COLLECT_JS = JS_HELPERS + """
+var elements = locate(arguments[0][0], arguments[0][1]), what = arguments[1],
+    name = arguments[2];
+switch (what) {
+case "count":
+    return elements.length;
+case "text":
+    return elements.map(function (element) {
+        return isDisplayed(element) ? element.innerText : "";
+    });
+case "attribute":
+    return elements.map(function (element) {
+        return element.getAttribute(name);
+    });
+}
+"""
+
+# Waits for a condition on an element to become true (or false, if negated)
+# and calls back with true, or with false after the timeout. Changes are
+# detected by a MutationObserver; a cheap in-page interval catches those that
+# don't involve DOM mutations, such as changes caused by stylesheets.
+OBSERVE_CONDITION_JS = JS_HELPERS + """
+var locator = arguments[0], condition = arguments[1], negate = arguments[2],
+    text = arguments[3], timeout = arguments[4],
+    callback = arguments[arguments.length - 1];
+var observer, interval, timer, done = false;
+
+var check = function () {
+    var element = locate(locator[0], locator[1])[0];
+    var result;
+    switch (condition) {
+    case "exists":
+        result = !!element;
+        break;
+    case "displayed":
+        result = !!element && isDisplayed(element);
+        break;
+    case "contains":
+        result = !!element && isDisplayed(element) &&
+            element.innerText.indexOf(text) >= 0;
+        break;
+    case "clickable":
+        result = !!element && isDisplayed(element) && !element.disabled;
+        break;
+    }
+    return result !== negate;
+};
+
+var finish = function (result) {
+    if (done) {
+        return;
+    }
+    done = true;
+    observer.disconnect();
+    clearInterval(interval);
+    clearTimeout(timer);
+    callback(result);
+};
+
+var onChange = function () {
+    if (check()) {
+        finish(true);
+    }
+};
+
+if (check()) {
+    callback(true);
+    return;
+}
+observer = new MutationObserver(onChange);
+observer.observe(document, {
+    subtree: true, childList: true, attributes: true, characterData: true
+});
+interval = setInterval(onChange, 100);
+timer = setTimeout(function () { finish(false); }, timeout * 1000);
+"""
+
+EXPECTED_CONDITIONS = {
+    "exists": EC.presence_of_element_located,
+    "displayed": EC.visibility_of_element_located,
+    "contains": EC.text_to_be_present_in_element,
+    "clickable": EC.element_to_be_clickable,
+}
+
+ElementCacheInfo = namedtuple("ElementCacheInfo", ["hits", "misses", "stale"])
+
+# Accessing any of these through SeleniumWrapper clears the element cache,
+# since afterwards the elements found so far may no longer be valid.
+NAVIGATION_ATTRIBUTES = ("get", "back", "forward", "refresh", "close", "switch_to")
+
+
+# Maps (callable, profile_dir_arguments, template_urls) to the template
+# profile directory created for them. See
+# SeleniumWrapper._get_template_profile().
+_template_profiles = {}
+_template_profiles_lock = threading.Lock()
+
+# Maps a hash of the credentials given to login() to (user pk, backend,
+# password hash). See _get_user_for_cached_credentials().
+_credentials = {}
+
+
+def _get_default_backend():
+    from django.contrib.auth import load_backend
+
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        if hasattr(backend, "get_user"):
+            return backend_path
+
+
+def _get_session_key(session_keys, user, backend=None):
+    """
+    Returns the key of a session in which the user is logged in.
+
+    session_keys maps (user pk, backend, password hash) to the key of a
+    session created before. Such a session is reused if it still exists in
+    the session store; otherwise a new session is created and added to
+    session_keys.
+    """
+    from django.contrib.auth import login
+
+    engine = import_module(settings.SESSION_ENGINE)
+    cache_key = (user.pk, backend or user.backend, user.password)
+    session_key = session_keys.get(cache_key)
+    if session_key is not None and engine.SessionStore().exists(session_key):
+        return session_key
+
+    # Create a fake request to store login details.
+    request = HttpRequest()
+    request.session = engine.SessionStore()
+    login(request, user, backend)
+
+    # Save the session values.
+    request.session.save()
+
+    session_keys[cache_key] = request.session.session_key
+    return request.session.session_key
+
+
+def _forget_session_key(session_keys, session_key):
+    for cache_key, value in list(session_keys.items()):
+        if value == session_key:
+            del session_keys[cache_key]
+
+
+def _hash_credentials(credentials):
+    return hashlib.sha256(repr(sorted(credentials.items())).encode()).hexdigest()
+
+
+def _cache_credentials(credentials, user):
+    from django.contrib.auth import load_backend
+    from django.contrib.auth.backends import ModelBackend
+
+    # Only ModelBackend is known to authenticate solely by the password
+    # hash stored in the database.
+    if isinstance(load_backend(user.backend), ModelBackend):
+        _credentials[_hash_credentials(credentials)] = (
+            user.pk,
+            user.backend,
+            user.password,
+        )
+
+
+def _get_user_for_cached_credentials(credentials):
+    """
+    Returns the user these credentials authenticated last time, if any.
+
+    authenticate() is slow, since password hashers are deliberately
+    expensive. If the same credentials have been used before, and the
+    user still exists with the same password hash, they would
+    authenticate the same user again, so authenticate() can be skipped.
+    Returns None if this is not the case.
+    """
+    from django.contrib.auth import get_user_model
+
+    cached = _credentials.get(_hash_credentials(credentials))
+    if cached is None:
+        return None
+    pk, backend, password = cached
+    user = get_user_model()._default_manager.filter(pk=pk).first()
+    if user is None or user.password != password:
+        return None
+    username = credentials.get("username", credentials.get(user.USERNAME_FIELD))
+    if username != user.get_username():
+        return None
+    user.backend = backend
+    return user
 
 
 class SeleniumWrapper(object):
+    _driver_id = None
+    _driver_future = None
+    _profile_dir = None
+    _display = None
+
+    # The login sessions of this browser, which login() and force_login()
+    # reuse; see _get_session_key(). They are not shared with other
+    # browsers, since one browser logging out or changing its session
+    # would affect the others.
+    _session_keys = None
+    _finalizer = None
+    _server_activity = None
+
+    # Attributes stored in the wrapper rather than in the driver (in
+    # addition to those starting with an underscore)
+    _own_attributes = ("driver", "live_server_url")
+
     def __new__(cls, *args, **kwargs):
         if not hasattr(cls, "_instance"):
-            cls._instance = super(SeleniumWrapper, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(SeleniumWrapper, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, driver_id=None):
         SELENIUM_WEBDRIVERS = getattr(settings, "SELENIUM_WEBDRIVERS", {})
         if not SELENIUM_WEBDRIVERS:
             return
-        driver_id = os.environ.get("SELENIUM_WEBDRIVER", "default")
-        driver = SELENIUM_WEBDRIVERS[driver_id]
+        driver_id = driver_id or os.environ.get("SELENIUM_WEBDRIVER", "default")
+        if self.reuse_browser() and self._has_driver():
+            if driver_id == self._driver_id and self.is_alive():
+                return
+            self._discard_driver()
+        self._start(driver_id)
+
+    @classmethod
+    def create(cls, driver_id=None):
+        """
+        Returns a new SeleniumWrapper with a browser of its own.
+
+        Unlike SeleniumWrapper(), which always returns the same object,
+        this can be used to run more browsers at the same time. driver_id
+        is a key of SELENIUM_WEBDRIVERS; the default is the one
+        specified by the SELENIUM_WEBDRIVER environment variable.
+        """
+        self = object.__new__(cls)
+        self._start(driver_id or os.environ.get("SELENIUM_WEBDRIVER", "default"))
+        return self
+
+    def _start(self, driver_id):
+        SELENIUM_WEBDRIVERS = getattr(settings, "SELENIUM_WEBDRIVERS", {})
+        config = SELENIUM_WEBDRIVERS[driver_id]
+        if getattr(settings, "SELENIUM_BACKGROUND_START", True):
+            # Start the browser in another thread; self.driver will wait for
+            # it (see __getattr__). Meanwhile the caller can do other things,
+            # such as starting the live server.
+            self.__dict__.pop("driver", None)
+            self._driver_future = Future()
+            thread = threading.Thread(
+                target=self._create_driver_in_background,
+                args=(config, self._driver_future),
+            )
+            thread.daemon = True
+            thread.start()
+        else:
+            self._driver_future = None
+            self.driver = self._create_driver(config)
+        self._driver_id = driver_id
+        self._element_cache = {}
+        self._element_cache_info = ElementCacheInfo(0, 0, 0)
+        self._script_timeout = None
+        self._window_size = None
+        if self.reuse_browser() and self._finalizer is None:
+            # Unlike atexit, this also runs when a multiprocessing worker
+            # (such as those of "manage.py test --parallel") exits.
+            self._finalizer = Finalize(self, self._quit_at_exit, exitpriority=10)
+
+    def _create_driver_in_background(self, config, future):
+        try:
+            future.set_result(self._create_driver(config))
+        except BaseException as e:
+            # Kept so that each attempt to use the driver raises the
+            # exception with this traceback, rather than with one that grows
+            # every time it is raised.
+            future.start_traceback = e.__traceback__
+            future.set_exception(e)
+
+    def _has_driver(self):
+        return "driver" in self.__dict__ or self._driver_future is not None
+
+    def _wait_for_driver(self):
+        """
+        Waits until the browser started in the background is running.
+
+        Raises the exception that starting it raised, if any.
+        """
+        if self._driver_future is not None:
+            self.driver
+
+    def _create_driver(self, driver):
         callable = driver["callable"]
         args = driver["args"]
         kwargs = driver["kwargs"]
-        self.driver = callable(*args, **kwargs)
+        profile_dir_arguments = driver.get("profile_dir_arguments")
+        if driver.get("template_profile") and not profile_dir_arguments:
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries with template_profile must "
+                "specify profile_dir_arguments"
+            )
+        if profile_dir_arguments and "options" not in kwargs:
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries with profile_dir_arguments "
+                'must specify "options" in their kwargs'
+            )
+        if driver.get("virtual_display") and driver.get("remote"):
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries can't have both remote and "
+                "virtual_display"
+            )
+        try:
+            if profile_dir_arguments:
+                template = None
+                if driver.get("template_profile"):
+                    template = self._get_template_profile(driver)
+                self._profile_dir = tempfile.mkdtemp(
+                    prefix="selenium-worker{}-".format(get_worker_id())
+                )
+                if template:
+                    profiles.clone_profile(template, self._profile_dir)
+                kwargs = self._with_profile_dir(kwargs, driver, self._profile_dir)
+            if driver.get("virtual_display"):
+                self._display = displays.pool.acquire(displays.get_size())
+                kwargs = displays.with_display(callable, kwargs, self._display)
+            start = time.monotonic()
+            if driver.get("remote"):
+                # Imported here because it needs a recent Selenium 4
+                from . import remote
+
+                result = remote.create_driver(
+                    callable, args, kwargs, remote.get_options(driver)
+                )
+            else:
+                result = callable(*args, **kwargs)
+            if durations.is_enabled():
+                durations.recorder.browser_start(time.monotonic() - start)
+            if instrumentation.is_enabled():
+                instrumentation.instrument(result)
+            blocked_urls = driver.get("blocked_urls")
+            if blocked_urls:
+                self._block_urls(result, blocked_urls)
+        except BaseException:
+            # The display can be used by the next browser
+            self._release_display()
+            self._remove_profile_dir()
+            raise
+        return result
+
+    def _remove_profile_dir(self):
+        if self._profile_dir:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+            self._profile_dir = None
+
+    def _release_display(self):
+        if self._display is not None:
+            displays.pool.release(self._display)
+            self._display = None
+
+    @staticmethod
+    def _with_profile_dir(kwargs, driver, profile_dir):
+        options = copy.deepcopy(kwargs["options"])
+        for argument in driver["profile_dir_arguments"]:
+            options.add_argument(argument.format(profile_dir))
+        return dict(kwargs, options=options)
+
+    @classmethod
+    def _get_template_profile(cls, driver):
+        """
+        Returns the template profile directory for the SELENIUM_WEBDRIVERS
+        entry "driver", creating it if needed.
+
+        The template is created once per process, by starting the browser
+        with an empty profile (on a virtual display, if the entry has
+        "virtual_display"), visiting the entry's "template_urls" (so that
+        they are cached), and quitting. It is removed when the process exits.
+        """
+        key = (
+            driver["callable"],
+            tuple(driver["profile_dir_arguments"]),
+            tuple(driver.get("template_urls", ())),
+        )
+        with _template_profiles_lock:
+            if key in _template_profiles:
+                return _template_profiles[key]
+            template = tempfile.mkdtemp(
+                prefix="selenium-template{}-".format(get_worker_id())
+            )
+            display = None
+            try:
+                kwargs = cls._with_profile_dir(driver["kwargs"], driver, template)
+                if driver.get("virtual_display"):
+                    display = displays.pool.acquire(displays.get_size())
+                    kwargs = displays.with_display(driver["callable"], kwargs, display)
+                browser = driver["callable"](*driver["args"], **kwargs)
+                try:
+                    browser.get("about:blank")
+                    for url in driver.get("template_urls", ()):
+                        browser.get(url)
+                finally:
+                    browser.quit()
+            except Exception:
+                shutil.rmtree(template, ignore_errors=True)
+                raise
+            finally:
+                # The browser that uses the template can have it
+                if display is not None:
+                    displays.pool.release(display)
+            # After the browsers that are reused have quit (see _start())
+            Finalize(
+                None,
+                shutil.rmtree,
+                args=(template,),
+                kwargs={"ignore_errors": True},
+                exitpriority=1,
+            )
+            _template_profiles[key] = template
+            return template
+
+    @staticmethod
+    def _execute_cdp_cmd(driver, cmd, params):
+        if hasattr(driver, "execute_cdp_cmd"):
+            return driver.execute_cdp_cmd(cmd, params)
+        # webdriver.Remote doesn't have the command, but a remote Chromium
+        # (e.g. on Selenium Grid) accepts it.
+        driver.command_executor._commands["executeCdpCommand"] = (
+            "POST",
+            "/session/$sessionId/goog/cdp/execute",
+        )
+        return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params})[
+            "value"
+        ]
+
+    @classmethod
+    def _block_urls(cls, driver, patterns):
+        try:
+            cls._execute_cdp_cmd(driver, "Network.enable", {})
+            cls._execute_cdp_cmd(
+                driver, "Network.setBlockedURLs", {"urls": list(patterns)}
+            )
+        except (AttributeError, WebDriverException):
+            driver.quit()
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries with blocked_urls must use a "
+                "browser that supports the Chrome DevTools Protocol, such as "
+                "Chrome or Edge"
+            )
 
     def __getattr__(self, name):
+        if name == "driver":
+            if self._driver_future is None:
+                raise AttributeError(name)
+            # The browser is being started in the background; wait for it.
+            exception = self._driver_future.exception()
+            if exception is not None:
+                raise exception.with_traceback(self._driver_future.start_traceback)
+            driver = self._driver_future.result()
+            self.driver = driver
+            self._driver_future = None
+            return driver
+        if name in NAVIGATION_ATTRIBUTES:
+            self.clear_element_cache()
         return getattr(self.driver, name)
 
     def __setattr__(self, name, value):
-        if name == "driver":
+        if name in self._own_attributes or name.startswith("_"):
             super(SeleniumWrapper, self).__setattr__(name, value)
         else:
             setattr(self.driver, name, value)
 
+    @property
+    def aio(self):
+        """The asyncio interface; see django_selenium_clean.aio."""
+        return AsyncSeleniumWrapper(self)
+
     def __bool__(self):
         return bool(self.driver)
 
@@ -57,12 +718,15 @@ class SeleniumWrapper(object):
         """
         from django.contrib.auth import authenticate
 
-        user = authenticate(**credentials)
+        user = _get_user_for_cached_credentials(credentials) or authenticate(
+            **credentials
+        )
         if (
             user
             and user.is_active
             and "django.contrib.sessions" in settings.INSTALLED_APPS
         ):
+            _cache_credentials(credentials, user)
             self._login(user)
             return True
         else:
@@ -80,37 +744,42 @@ class SeleniumWrapper(object):
 
         The code is based on django.test.client.Client.force_login.
         """
-
-        def get_backend():
-            from django.contrib.auth import load_backend
-
-            for backend_path in settings.AUTHENTICATION_BACKENDS:
-                backend = load_backend(backend_path)
-                if hasattr(backend, "get_user"):
-                    return backend_path
-
         if backend is None:
-            backend = get_backend()
+            backend = _get_default_backend()
         user.backend = backend
         self._login(user, backend)
 
-    def _login(self, user, backend=None):
-        from django.contrib.auth import login
+    def create_sessions(self, users, backend=None):
+        """
+        Creates login sessions for many users in a single transaction.
 
-        engine = import_module(settings.SESSION_ENGINE)
+        Afterwards, force_login() for any of these users only needs to set
+        the session cookie. Returns a dictionary mapping each user to its
+        session key.
+        """
+        from django.db import transaction
 
-        # Create a fake request to store login details.
-        request = HttpRequest()
-        request.session = engine.SessionStore()
-        login(request, user, backend)
+        if backend is None:
+            backend = _get_default_backend()
+        result = {}
+        with transaction.atomic():
+            for user in users:
+                user.backend = backend
+                result[user] = _get_session_key(self._get_session_keys(), user, backend)
+        return result
 
-        # Save the session values.
-        request.session.save()
+    def _get_session_keys(self):
+        if self._session_keys is None:
+            self._session_keys = {}
+        return self._session_keys
+
+    def _login(self, user, backend=None):
+        session_key = _get_session_key(self._get_session_keys(), user, backend)
 
         # Set the cookie to represent the session.
         cookie_data = {
             "name": settings.SESSION_COOKIE_NAME,
-            "value": request.session.session_key,
+            "value": session_key,
             "max-age": None,
             "path": "/",
             "secure": settings.SESSION_COOKIE_SECURE or False,
@@ -131,13 +800,208 @@ class SeleniumWrapper(object):
         if session_cookie:
             session.delete(session_key=session_cookie["value"])
             self.delete_cookie(settings.SESSION_COOKIE_NAME)
+            _forget_session_key(self._get_session_keys(), session_cookie["value"])
 
     def wait_until_n_windows(self, n, timeout=2):
-        for i in range(timeout * 10):
-            if len(self.window_handles) == n:
-                return
-            time.sleep(0.1)
-        raise AssertionError("Timeout while waiting for {0} windows".format(n))
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        with _recording_wait("{} windows".format(n), timeout):
+            try:
+                policy.poll(lambda: len(self.window_handles) == n, timeout)
+            except TimeoutException:
+                raise AssertionError("Timeout while waiting for {0} windows".format(n))
+
+    def wait_until_server_idle(self, timeout=None, idle_time=0.1):
+        """
+        Waits until the live server has served no request for idle_time
+        seconds.
+
+        idle_time gives the browser time to send the requests that follow
+        those that have finished (for example the AJAX requests made by a
+        page that has just loaded). The default timeout is that of the
+        SELENIUM_WAIT_POLICY.
+        """
+        if self._server_activity is None:
+            raise RuntimeError(
+                "wait_until_server_idle() can only be used in a SeleniumTestCase"
+            )
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        with _recording_wait("server idle", timeout):
+            self._server_activity.wait_until_idle(timeout, idle_time)
+
+    def set_window_width(self, width, height=1024):
+        """
+        Resizes the browser window, unless it already has that size.
+
+        Resizing sometimes fails while the browser is starting up, so it is
+        retried for a while before letting it raise.
+        """
+        if self._window_size == (width, height):
+            return
+        # If the browser couldn't be started, raise that now rather than
+        # retrying the resize.
+        self._wait_for_driver()
+
+        def try_to_resize():
+            try:
+                self.set_window_size(width, height)
+                return True
+            except WebDriverException:
+                return False
+
+        policy = WaitPolicy.from_settings()
+        try:
+            policy.poll(try_to_resize, policy.get_timeout(5))
+        except TimeoutException:
+            self.set_window_size(width, height)
+        self._window_size = (width, height)
+
+    @staticmethod
+    def cache_elements():
+        return getattr(settings, "SELENIUM_CACHE_ELEMENTS", True)
+
+    def find_cached_element(self, locator, stale=False):
+        """
+        Like find_element(*locator), but reuses the previously found element.
+
+        The cache is cleared whenever the browser navigates or switches to
+        another window or frame. Specify stale=True if the element
+        previously returned has turned out to be stale; it will then be
+        located again.
+        """
+        hits, misses, stale_count = self._element_cache_info
+        if stale:
+            stale_count += 1
+        elif self.cache_elements() and locator in self._element_cache:
+            self._element_cache_info = ElementCacheInfo(hits + 1, misses, stale_count)
+            return self._element_cache[locator]
+        start = time.monotonic()
+        element = self.driver.find_element(*locator)
+        if instrumentation.is_enabled():
+            instrumentation.recorder.lookup(locator, time.monotonic() - start)
+        if self.cache_elements():
+            self._element_cache[locator] = element
+        self._element_cache_info = ElementCacheInfo(hits, misses + 1, stale_count)
+        return element
+
+    def clear_element_cache(self):
+        self._element_cache.clear()
+
+    def element_cache_info(self):
+        """
+        Returns the number of hits, misses, and stale elements of the cache.
+        """
+        return self._element_cache_info
+
+    def snapshot(self, *elements, attributes=()):
+        """
+        Returns the state of many elements using a single browser command.
+
+        The elements can be PageElement objects or locators. The result is
+        a dictionary that maps each of them to an ElementState named tuple
+        with "exists", "displayed", "text" and "attributes", the latter
+        being a dictionary with the values of the specified attributes.
+        """
+        locators = [list(getattr(element, "locator", element)) for element in elements]
+        states = self.execute_script(SNAPSHOT_JS, locators, list(attributes))
+        result = {}
+        for element, state in zip(elements, states):
+            if state is None:
+                result[element] = ElementState(False, False, None, {})
+            else:
+                result[element] = ElementState(True, *state)
+        return result
+
+    @staticmethod
+    def wait_engine():
+        return getattr(settings, "SELENIUM_WAIT_ENGINE", "polling")
+
+    def observe_condition(self, locator, condition, timeout, negate=False, text=None):
+        """
+        Waits for a condition on an element using a MutationObserver.
+
+        "condition" is "exists", "displayed", "contains" (in which case
+        "text" must be specified) or "clickable". Returns True if the
+        condition became true (or false, if "negate" is set), False on
+        timeout, and None if the browser couldn't run the observer (for
+        example because it doesn't support asynchronous scripts, or because
+        the page was unloaded while waiting).
+        """
+        try:
+            if self._script_timeout is None or self._script_timeout < timeout + 1:
+                self.set_script_timeout(timeout + 1)
+                self._script_timeout = timeout + 1
+            return self.execute_async_script(
+                OBSERVE_CONDITION_JS, list(locator), condition, negate, text, timeout
+            )
+        except WebDriverException:
+            return None
+
+    @staticmethod
+    def reuse_browser():
+        return getattr(settings, "SELENIUM_REUSE_BROWSER", False)
+
+    def is_alive(self):
+        """
+        Returns True if the browser responds to commands.
+
+        Any exception (not just WebDriverException) counts as a dead
+        browser, since a crashed driver process usually results in
+        connection errors.
+        """
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """
+        Brings the browser to a clean state without restarting it.
+
+        Closes all windows but the first, clears local and session storage
+        and cookies, and navigates to a blank page. Storage and cookies can
+        only be cleared for the current origin, so this should be called
+        while the browser is still on the live server.
+        """
+        handles = self.window_handles
+        for handle in handles[1:]:
+            self.switch_to.window(handle)
+            self.close()
+        self.switch_to.window(handles[0])
+        try:
+            self.execute_script(
+                "window.localStorage.clear(); window.sessionStorage.clear();"
+            )
+        except WebDriverException:
+            # E.g. the browser is on about:blank, where storage is unavailable
+            pass
+        self.delete_all_cookies()
+        self.get("about:blank")
+        self._element_cache_info = ElementCacheInfo(0, 0, 0)
+
+    def _park(self):
+        # Leave the remote session clean for whoever takes it over
+        try:
+            self.reset()
+        except Exception:
+            self.driver.quit()
+        else:
+            self.driver.park()
+
+    def _discard_driver(self):
+        try:
+            self.quit()
+        except Exception:
+            pass
+        self.__dict__.pop("driver", None)
+        self._driver_future = None
+        self._release_display()
+
+    def _quit_at_exit(self):
+        if self._has_driver() and self.is_alive():
+            self.quit()
 
     def quit(self):
         # The way to exit the browser is selenium.driver.quit(), however we
@@ -145,16 +1009,82 @@ class SeleniumWrapper(object):
         # https://github.com/SeleniumHQ/selenium/issues/767
         if self.driver.capabilities["browserName"] == "phantomjs":
             self.driver.service.process.send_signal(signal.SIGTERM)
+        elif getattr(self.driver, "broker", None) is not None:
+            self._park()
         else:
             self.driver.quit()
+        self._remove_profile_dir()
+        self._release_display()
+
+
+def _snapshot_database(alias):
+    # Copies an SQLite database to memory using SQLite's backup API
+    connection = connections[alias]
+    connection.ensure_connection()
+    snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.connection.backup(snapshot)
+    return snapshot
+
+
+def _restore_database(alias, snapshot):
+    connection = connections[alias]
+    connection.ensure_connection()
+    snapshot.backup(connection.connection)
+
+
+def sequential_widths(test_item):
+    """
+    Makes a test method or SeleniumTestCase run its widths one at a time.
+
+    For tests that write to the database, which the widths of a test share
+    when SELENIUM_WIDTHS_CONCURRENT is set.
+    """
+    test_item._selenium_sequential_widths = True
+    return test_item
 
 
 class SeleniumTestCase(StaticLiveServerTestCase):
+    # The key of SELENIUM_WEBDRIVERS to use; None means the one specified by
+    # the SELENIUM_WEBDRIVER environment variable.
+    selenium_webdriver = None
+
+    _selenium_width = None
+
+    # The width to which the window is resized before setUp()
+    _window_width = None
+
+    # Browsers other than the main one, such as those used for running
+    # SELENIUM_WIDTHS concurrently. Shared by all test cases, so that they
+    # can be reused if SELENIUM_REUSE_BROWSER is set.
+    _extra_seleniums = {}
+
     @classmethod
     def setUpClass(cls):
+        cls._setup_time = time.monotonic()
 
-        super(SeleniumTestCase, cls).setUpClass()
-        cls.selenium = SeleniumWrapper()
+        # Set by _create_server_thread()
+        cls.selenium = None
+        try:
+            super(SeleniumTestCase, cls).setUpClass()
+        except Exception:
+            selenium = cls.selenium
+            if (
+                selenium is not None
+                and not selenium.reuse_browser()
+                and selenium._has_driver()
+            ):
+                selenium._discard_driver()
+            raise
+        try:
+            # So that if the browser can't be started, it is an error of the
+            # test case, as when it isn't started in the background.
+            cls.selenium._wait_for_driver()
+        except Exception:
+            cls.selenium._discard_driver()
+            # The class cleanups, such as stopping the live server, are done
+            # by unittest.
+            super(SeleniumTestCase, cls).tearDownClass()
+            raise
         PageElement.selenium = cls.selenium
 
         # Normally we would just do something like
@@ -166,75 +1096,551 @@ class SeleniumTestCase(StaticLiveServerTestCase):
             cls.server_thread.host,
             cls.server_thread.port,
         )
+        cls.selenium._server_activity = cls._server_activity
 
     @classmethod
     def tearDownClass(cls):
 
-        cls.selenium.quit()
+        for selenium in [cls.selenium] + list(cls._extra_seleniums.values()):
+            if selenium.reuse_browser():
+                # The live server is still running at this point, so the
+                # browser's storage for its origin can be cleared.
+                try:
+                    selenium.reset()
+                except Exception:
+                    # It will be noticed and replaced when next needed
+                    pass
+            else:
+                selenium.quit()
+        if not SeleniumWrapper.reuse_browser():
+            cls._extra_seleniums.clear()
         PageElement.selenium = None
+        snapshots = cls.__dict__.get("_database_snapshots")
+        if snapshots:
+            # Leave the databases as they were before the first test
+            for alias, (initial, snapshot) in snapshots.items():
+                _restore_database(alias, initial)
+                initial.close()
+                snapshot.close()
+            cls._database_snapshots = None
         super(SeleniumTestCase, cls).tearDownClass()
+        if durations.is_enabled():
+            durations.recorder.test_case(cls, time.monotonic() - cls._setup_time)
+
+    @classmethod
+    def _use_database_snapshots(cls):
+        return getattr(settings, "SELENIUM_DATABASE_SNAPSHOTS", False) and all(
+            connections[alias].vendor == "sqlite"
+            for alias in cls._databases_names(include_mirrors=False)
+        )
+
+    def _fixture_setup(self):
+        # With SELENIUM_DATABASE_SNAPSHOTS, the databases are copied after
+        # the fixtures have been loaded for the first test, and restored from
+        # that copy for the other tests, instead of being flushed and having
+        # the fixtures loaded again.
+        cls = self if isinstance(self, type) else type(self)
+        snapshots = cls.__dict__.get("_database_snapshots")
+        if snapshots:
+            for alias, (initial, snapshot) in snapshots.items():
+                _restore_database(alias, snapshot)
+            return
+        use_snapshots = cls._use_database_snapshots()
+        if use_snapshots:
+            aliases = cls._databases_names(include_mirrors=False)
+            initial = {alias: _snapshot_database(alias) for alias in aliases}
+        super(SeleniumTestCase, self)._fixture_setup()
+        if use_snapshots:
+            cls._database_snapshots = {
+                alias: (initial[alias], _snapshot_database(alias)) for alias in aliases
+            }
+
+    if isinstance(
+        inspect.getattr_static(TransactionTestCase, "_fixture_setup"), classmethod
+    ):
+        # Since Django 5.2; before that, it is an instance method.
+        _fixture_setup = classmethod(_fixture_setup)
+
+    def _fixture_teardown(self):
+        if self.__class__.__dict__.get("_database_snapshots"):
+            # The next test, or tearDownClass(), restores the databases
+            return
+        super(SeleniumTestCase, self)._fixture_teardown()
+
+    @classmethod
+    def _create_server_thread(cls, connections_override):
+        # The browser starts in the background (unless
+        # SELENIUM_BACKGROUND_START is False) while the live server starts.
+        # This is done here rather than at the start of setUpClass(), so
+        # that the settings overridden for the class are in effect.
+        cls.selenium = SeleniumWrapper(cls.selenium_webdriver)
+
+        static_handler = cls.static_handler
+        if static_handler is StaticFilesHandler and getattr(
+            settings, "SELENIUM_CACHE_STATIC_FILES", False
+        ):
+            static_handler = CachedStaticFilesHandler
+
+        # Count the requests served, for selenium.wait_until_server_idle()
+        cls._server_activity = ServerActivity()
+
+        def tracked_handler(application):
+            return cls._server_activity.wrap(static_handler(application))
+
+        return cls.server_thread_class(
+            cls.host,
+            tracked_handler,
+            connections_override=connections_override,
+            port=cls.port,
+        )
+
+    @classmethod
+    def _get_extra_selenium(cls, name):
+        selenium = cls._extra_seleniums.get(name)
+        if (
+            selenium is None
+            or selenium._driver_id != cls.selenium._driver_id
+            or not selenium.is_alive()
+        ):
+            if selenium is not None:
+                selenium._discard_driver()
+            selenium = SeleniumWrapper.create(cls.selenium._driver_id)
+            cls._extra_seleniums[name] = selenium
+        selenium.live_server_url = cls.selenium.live_server_url
+        selenium._server_activity = cls._server_activity
+        return selenium
+
+    def get_selenium(self, name):
+        """
+        Returns an additional browser, identified by name.
+
+        The browser is started the first time a name is used, and then
+        kept until the end of the test case (or reused by later test
+        cases, if SELENIUM_REUSE_BROWSER is set), like self.selenium.
+        """
+        key = "session-{}".format(name)
+        if self._selenium_width is not None:
+            # Concurrent widths must not share it
+            key += "-width-{}".format(self._selenium_width)
+        selenium = self._get_extra_selenium(key)
+        if self._selenium_width is not None:
+            selenium.set_window_width(self._selenium_width)
+        return selenium
+
+    def run_concurrently(self, *actions):
+        """
+        Runs actions on different browsers at the same time.
+
+        Each action is a (selenium, function) tuple; function(selenium) is
+        called in a thread of its own, in which PageElement and PageElements
+        objects use that browser. Waits for all of them to finish, and
+        returns a list of their results. If any of them raises an exception,
+        the exception of the first such action is raised.
+        """
+
+        def run(selenium, function):
+            _thread_local.selenium = selenium
+            try:
+                return function(selenium)
+            finally:
+                _thread_local.selenium = None
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=max(len(actions), 1)) as executor:
+            futures = [
+                executor.submit(run, selenium, function)
+                for selenium, function in actions
+            ]
+        return [future.result() for future in futures]
 
     def __call__(self, result=None):
-        if hasattr(self, "selenium"):
-            for width in getattr(settings, "SELENIUM_WIDTHS", [1024]):
-                i = 0
-                while True:
-                    try:
-                        self.selenium.set_window_size(width, 1024)
-                        break
-                    except WebDriverException:
-                        if i >= 10:
-                            raise
-                        i += 1
-                        time.sleep(0.5)
-        return super(SeleniumTestCase, self).__call__(result)
+        if not durations.is_enabled():
+            return self._call_at_widths(result)
+        start = time.monotonic()
+        try:
+            return self._call_at_widths(result)
+        finally:
+            durations.recorder.test(
+                self.__class__, self._testMethodName, time.monotonic() - start
+            )
+
+    def _call_at_widths(self, result):
+        if not hasattr(self, "selenium"):
+            return super(SeleniumTestCase, self).__call__(result)
+        widths = getattr(settings, "SELENIUM_WIDTHS", [1024])
+        if len(widths) == 1:
+            self._window_width = widths[0]
+            return super(SeleniumTestCase, self).__call__(result)
+        if (
+            getattr(settings, "SELENIUM_WIDTHS_CONCURRENT", False)
+            and not self._is_skipped()
+            and not self._has_sequential_widths()
+        ):
+            return self._run_widths_concurrently(widths, result)
+        for width in widths:
+            test = self._copy_for_width(width)
+            super(SeleniumTestCase, test).__call__(result)
+
+    def _copy_for_width(self, width):
+        # A separate copy for each width, so that the results refer to
+        # distinct tests, labeled with the width.
+        test = copy.copy(self)
+        test._cleanups = []
+        test._selenium_width = width
+        test._window_width = width
+        return test
+
+    def _callSetUp(self):
+        # Resizing is part of the test's setup, so that if it fails (e.g.
+        # because the browser couldn't be started) unittest reports it as an
+        # error of the test.
+        if self._window_width is not None:
+            self.selenium.set_window_width(self._window_width)
+        super(SeleniumTestCase, self)._callSetUp()
+
+    def _is_skipped(self):
+        test_method = getattr(self, self._testMethodName)
+        return getattr(self.__class__, "__unittest_skip__", False) or getattr(
+            test_method, "__unittest_skip__", False
+        )
+
+    def _has_sequential_widths(self):
+        test_method = getattr(self, self._testMethodName)
+        return getattr(self.__class__, "_selenium_sequential_widths", False) or getattr(
+            test_method, "_selenium_sequential_widths", False
+        )
+
+    def _run_widths_concurrently(self, widths, result):
+        # Each width runs in its own thread, with its own copy of the test
+        # case and its own browser. Django's per-test setup and teardown
+        # (such as flushing the database) is done only once, around all of
+        # them.
+        if result is None:
+            result = self.defaultTestResult()
+        # Errors are reported as SimpleTestCase._setup_and_call() does
+        try:
+            if getattr(self.__class__, "_pre_setup_ran_eagerly", False):
+                self.__class__._pre_setup_ran_eagerly = False
+            else:
+                self._pre_setup()
+        except Exception:
+            result.addError(self, sys.exc_info())
+            return
+        try:
+            threads = []
+            results = []
+            for i, width in enumerate(widths):
+                test = self._copy_for_width(width)
+                if i > 0:
+                    test.selenium = self._get_extra_selenium("width-%d" % width)
+                results.append(_DeferredTestResult(result))
+                thread = threading.Thread(
+                    target=test._run_in_thread, args=(results[-1],)
+                )
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+            for deferred_result in results:
+                deferred_result.replay()
+        finally:
+            try:
+                self._post_teardown()
+            except Exception:
+                result.addError(self, sys.exc_info())
+
+    def _run_in_thread(self, result):
+        test_method = getattr(self, self._testMethodName)
+        if inspect.iscoroutinefunction(test_method):
+            # Done by SimpleTestCase.__call__(), which isn't used here
+            from asgiref.sync import async_to_sync
+
+            setattr(self, self._testMethodName, async_to_sync(test_method))
+        _thread_local.selenium = self.selenium
+        try:
+            self.run(result)
+        finally:
+            _thread_local.selenium = None
+
+    def run(self, result=None):
+        if artifacts.is_enabled():
+            self._capture_artifacts_on_failure()
+        if not instrumentation.is_enabled():
+            return super(SeleniumTestCase, self).run(result)
+        with instrumentation.recorder.test(self.id()):
+            return super(SeleniumTestCase, self).run(result)
+
+    def _capture_artifacts_on_failure(self):
+        # The test method is wrapped, rather than the failure noticed in the
+        # result, so that the browsers are captured before tearDown() and
+        # the cleanups change them.
+        test_method = getattr(self, self._testMethodName)
+        if getattr(test_method, "_captures_artifacts", False) or getattr(
+            test_method, "__unittest_expecting_failure__", False
+        ):
+            return
+
+        @functools.wraps(test_method)
+        def capturing_test_method(*args, **kwargs):
+            try:
+                return test_method(*args, **kwargs)
+            except SkipTest:
+                raise
+            except Exception:
+                captured = artifacts.capture(self._get_browsers_to_capture())
+                artifacts.get_writer().submit(self.id(), captured)
+                raise
+
+        capturing_test_method._captures_artifacts = True
+        setattr(self, self._testMethodName, capturing_test_method)
+
+    def _get_browsers_to_capture(self):
+        browsers = [("", self.selenium)]
+        suffix = ""
+        if self._selenium_width is not None:
+            suffix = "-width-{}".format(self._selenium_width)
+        for key, selenium in sorted(self._extra_seleniums.items()):
+            if (
+                key.startswith("session-")
+                and key.endswith(suffix)
+                and selenium._has_driver()
+            ):
+                name = key.replace("session-", "", 1)
+                if suffix:
+                    name = name.rsplit(suffix, 1)[0]
+                browsers.append((name, selenium))
+        return browsers
+
+    def id(self):
+        test_id = super(SeleniumTestCase, self).id()
+        if self._selenium_width is None:
+            return test_id
+        return "{}[width={}]".format(test_id, self._selenium_width)
+
+    def __str__(self):
+        description = super(SeleniumTestCase, self).__str__()
+        if self._selenium_width is None:
+            return description
+        return "{} [width={}]".format(description, self._selenium_width)
+
+
+class _DeferredTestResult(object):
+    """
+    Records the calls made to a test result, so that they can be replayed.
+
+    Used when tests run in threads, so that the output of each test isn't
+    interleaved with that of the others.
+    """
+
+    def __init__(self, result):
+        self._result = result
+        self._calls = []
+
+    def __getattr__(self, name):
+        value = getattr(self._result, name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+
+        return method
+
+    def replay(self):
+        for name, args, kwargs in self._calls:
+            getattr(self._result, name)(*args, **kwargs)
 
 
 class PageElement(object):
 
     selenium = None
+    _bound_selenium = None
 
     def __init__(self, *args):
         if len(args) == 2:
             self.locator = args
 
-    def wait_until_exists(self, timeout=10):
-        WebDriverWait(self.selenium, timeout).until(
-            EC.presence_of_element_located(self.locator)
-        )
+    def bind(self, selenium):
+        """
+        Returns a copy of the PageElement that always uses that browser.
+        """
+        # Not copy.copy(), which would call __getattr__ on an instance with
+        # no locator
+        element = object.__new__(self.__class__)
+        element.__dict__.update(self.__dict__, _bound_selenium=selenium)
+        return element
 
-    def wait_until_not_exists(self, timeout=10):
-        WebDriverWait(self.selenium, timeout).until_not(
-            EC.presence_of_element_located(self.locator)
-        )
+    def wait_until_exists(self, timeout=None):
+        self._wait("exists", timeout)
 
-    def wait_until_is_displayed(self, timeout=10):
-        WebDriverWait(self.selenium, timeout).until(
-            EC.visibility_of_element_located(self.locator)
-        )
+    def wait_until_not_exists(self, timeout=None):
+        self._wait("exists", timeout, negate=True)
 
-    def wait_until_not_displayed(self, timeout=10):
-        WebDriverWait(self.selenium, timeout).until_not(
-            EC.visibility_of_element_located(self.locator)
-        )
+    def wait_until_is_displayed(self, timeout=None):
+        self._wait("displayed", timeout)
 
-    def wait_until_contains(self, text, timeout=10):
-        WebDriverWait(self.selenium, timeout).until(
-            EC.text_to_be_present_in_element(self.locator, text)
-        )
+    def wait_until_not_displayed(self, timeout=None):
+        self._wait("displayed", timeout, negate=True)
 
-    def wait_until_not_contains(self, text, timeout=10):
-        WebDriverWait(self.selenium, timeout).until_not(
-            EC.text_to_be_present_in_element(self.locator, text)
-        )
+    def wait_until_contains(self, text, timeout=None):
+        self._wait("contains", timeout, text=text)
 
-    def wait_until_is_clickable(self, timeout=10):
-        WebDriverWait(self.selenium, timeout).until(
-            EC.element_to_be_clickable(self.locator)
-        )
+    def wait_until_not_contains(self, text, timeout=None):
+        self._wait("contains", timeout, negate=True, text=text)
+
+    def wait_until_is_clickable(self, timeout=None):
+        self._wait("clickable", timeout)
+
+    @property
+    def aio(self):
+        """The asyncio interface; see django_selenium_clean.aio."""
+        return AsyncPageElement(self.bind(self._get_selenium()))
+
+    def _get_selenium(self):
+        if self._bound_selenium is not None:
+            return self._bound_selenium
+        selenium = getattr(_thread_local, "selenium", None)
+        return self.selenium if selenium is None else selenium
+
+    def _wait(self, condition, timeout, negate=False, text=None):
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        what = "{}{}: {}={}".format("not " if negate else "", condition, *self.locator)
+        with _recording_wait(what, timeout):
+            self._do_wait(policy, condition, timeout, negate, text)
+
+    def _do_wait(self, policy, condition, timeout, negate, text):
+        selenium = self._get_selenium()
+        if selenium.wait_engine() == "observer":
+            start = time.monotonic()
+            satisfied = selenium.observe_condition(
+                self.locator, condition, timeout, negate=negate, text=text
+            )
+            if satisfied is not None:
+                if not satisfied:
+                    raise TimeoutException()
+                return
+            # The observer couldn't be used; poll for the remaining time.
+            timeout = max(timeout - (time.monotonic() - start), 0)
+        args = (self.locator,) if text is None else (self.locator, text)
+        expected_condition = EXPECTED_CONDITIONS[condition](*args)
+        policy.poll(lambda: expected_condition(selenium), timeout, negate=negate)
 
     def exists(self):
-        return len(self.selenium.find_elements(*self.locator)) > 0
+        return len(self._get_selenium().find_elements(*self.locator)) > 0
 
     def __getattr__(self, name):
-        return getattr(self.selenium.find_element(*self.locator), name)
+        selenium = self._get_selenium()
+        element = selenium.find_cached_element(self.locator)
+        try:
+            value = getattr(element, name)
+        except StaleElementReferenceException:
+            element = selenium.find_cached_element(self.locator, stale=True)
+            value = getattr(element, name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            try:
+                return value(*args, **kwargs)
+            except StaleElementReferenceException:
+                element = selenium.find_cached_element(self.locator, stale=True)
+                return getattr(element, name)(*args, **kwargs)
+
+        return method
+
+
+class PageElements(object):
+    """
+    Lazy collection of all the elements that match a locator.
+
+    Like PageElement, it is initialized with a locator, and the elements are
+    located whenever needed; nothing is cached, as the number of elements
+    may change at any time.
+    """
+
+    selenium = None
+    _bound_selenium = None
+
+    def __init__(self, *args):
+        if len(args) == 2:
+            self.locator = args
+
+    def bind(self, selenium):
+        """
+        Returns a copy of the PageElements that always uses that browser.
+        """
+        elements = copy.copy(self)
+        elements._bound_selenium = selenium
+        return elements
+
+    @property
+    def aio(self):
+        """The asyncio interface; see django_selenium_clean.aio."""
+        return AsyncPageElements(self.bind(self._get_selenium()))
+
+    def _get_selenium(self):
+        if self._bound_selenium is not None:
+            return self._bound_selenium
+        selenium = getattr(_thread_local, "selenium", None)
+        if selenium is None:
+            selenium = self.selenium
+        return PageElement.selenium if selenium is None else selenium
+
+    def _collect(self, what, name=None):
+        return self._get_selenium().execute_script(
+            COLLECT_JS, list(self.locator), what, name
+        )
+
+    def count(self):
+        return self._collect("count")
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self._get_selenium().find_elements(*self.locator))
+
+    def __getitem__(self, index):
+        return self._get_selenium().find_elements(*self.locator)[index]
+
+    def texts(self):
+        """Returns the text of all the elements, with a single browser command."""
+        return self._collect("text")
+
+    def attributes(self, name):
+        """
+        Returns the value of an attribute of all the elements, with a single
+        browser command. The value is None for elements that don't have it.
+        """
+        return self._collect("attribute", name)
+
+    def wait_until_count(self, n, timeout=None):
+        self._wait_for_count(lambda count: count == n, "== {}".format(n), timeout)
+
+    def wait_until_count_changes(self, original_count=None, timeout=None):
+        """
+        Waits until the number of elements is other than original_count.
+
+        If original_count is not specified, the current number is used;
+        specify it if the change may happen before this is called, e.g.
+        count it before clicking the button that causes it.
+        """
+        if original_count is None:
+            original_count = self.count()
+        self._wait_for_count(
+            lambda count: count != original_count,
+            "!= {}".format(original_count),
+            timeout,
+        )
+
+    def _wait_for_count(self, condition, description, timeout):
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        what = "count {}: {}={}".format(description, *self.locator)
+        with _recording_wait(what, timeout):
+            policy.poll(
+                lambda: condition(self.count()),
+                timeout,
+                message="Timed out waiting for {}".format(what),
+            )
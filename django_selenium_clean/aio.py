@@ -0,0 +1,176 @@
+"""
+Asyncio interface to SeleniumWrapper, PageElement and PageElements.
+
+selenium.aio, element.aio and elements.aio have the same attributes and
+methods as the objects they belong to, but they are coroutines. Browser
+commands still use selenium's blocking HTTP client, so each of them runs
+in the event loop's default executor; however, waits sleep in the event
+loop between checks, so that many of them (on one browser or many) can
+be in progress at the same time without a thread each.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import functools
+import inspect
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+
+async def _run(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(function, *args, **kwargs)
+    )
+
+
+_missing = object()
+
+
+def _is_method(classes, name):
+    for cls in classes:
+        attribute = inspect.getattr_static(cls, name, _missing)
+        if attribute is not _missing:
+            return callable(attribute) or isinstance(attribute, classmethod)
+    return False
+
+
+class _AsyncProxy(object):
+    # Properties become awaitables, and methods coroutine functions, both
+    # of which run in the executor. The methods are those of the target's
+    # class and of "classes" (the classes the target proxies to); other
+    # attributes, such as selenium.aio.live_server_url, also become
+    # awaitables, since getting them may need a browser command.
+
+    classes = ()
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        if not _is_method((type(self._target),) + self.classes, name):
+            return _run(getattr, self._target, name)
+
+        def call(*args, **kwargs):
+            # Getting the method may also need browser commands, e.g.
+            # finding the element of a PageElement.
+            return getattr(self._target, name)(*args, **kwargs)
+
+        async def method(*args, **kwargs):
+            return await _run(call, *args, **kwargs)
+
+        return method
+
+
+class AsyncSeleniumWrapper(_AsyncProxy):
+    """
+    Returned by SeleniumWrapper.aio.
+
+    For example, "await selenium.aio.get(url)" or
+    "await selenium.aio.title".
+    """
+
+    classes = (WebDriver,)
+
+    async def wait_until_n_windows(self, n, timeout=2):
+        from . import WaitPolicy, _recording_wait
+
+        selenium = self._target
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        with _recording_wait("{} windows".format(n), timeout):
+            try:
+                await policy.poll_async(
+                    lambda: len(selenium.window_handles) == n, timeout
+                )
+            except TimeoutException:
+                raise AssertionError("Timeout while waiting for {0} windows".format(n))
+
+
+class AsyncPageElement(_AsyncProxy):
+    """
+    Returned by PageElement.aio.
+
+    For example, "await element.aio.wait_until_is_displayed()" or
+    "await element.aio.text". The waits always poll (SELENIUM_WAIT_ENGINE
+    is ignored), because the observer engine would occupy a thread for
+    the duration of the wait.
+    """
+
+    classes = (WebElement,)
+
+    async def wait_until_exists(self, timeout=None):
+        await self._wait("exists", timeout)
+
+    async def wait_until_not_exists(self, timeout=None):
+        await self._wait("exists", timeout, negate=True)
+
+    async def wait_until_is_displayed(self, timeout=None):
+        await self._wait("displayed", timeout)
+
+    async def wait_until_not_displayed(self, timeout=None):
+        await self._wait("displayed", timeout, negate=True)
+
+    async def wait_until_contains(self, text, timeout=None):
+        await self._wait("contains", timeout, text=text)
+
+    async def wait_until_not_contains(self, text, timeout=None):
+        await self._wait("contains", timeout, negate=True, text=text)
+
+    async def wait_until_is_clickable(self, timeout=None):
+        await self._wait("clickable", timeout)
+
+    async def _wait(self, condition, timeout, negate=False, text=None):
+        from . import EXPECTED_CONDITIONS, WaitPolicy, _recording_wait
+
+        element = self._target
+        selenium = element._get_selenium()
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        what = "{}{}: {}={}".format(
+            "not " if negate else "", condition, *element.locator
+        )
+        args = (element.locator,) if text is None else (element.locator, text)
+        expected_condition = EXPECTED_CONDITIONS[condition](*args)
+        with _recording_wait(what, timeout):
+            await policy.poll_async(
+                lambda: expected_condition(selenium), timeout, negate=negate
+            )
+
+
+class AsyncPageElements(_AsyncProxy):
+    """
+    Returned by PageElements.aio.
+
+    For example, "await rows.aio.texts()" or
+    "await rows.aio.wait_until_count(3)".
+    """
+
+    async def wait_until_count(self, n, timeout=None):
+        await self._wait_for_count(lambda count: count == n, "== {}".format(n), timeout)
+
+    async def wait_until_count_changes(self, original_count=None, timeout=None):
+        if original_count is None:
+            original_count = await _run(self._target.count)
+        await self._wait_for_count(
+            lambda count: count != original_count,
+            "!= {}".format(original_count),
+            timeout,
+        )
+
+    async def _wait_for_count(self, condition, description, timeout):
+        from . import WaitPolicy, _recording_wait
+
+        elements = self._target
+        policy = WaitPolicy.from_settings()
+        timeout = policy.get_timeout(timeout)
+        what = "count {}: {}={}".format(description, *elements.locator)
+        with _recording_wait(what, timeout):
+            await policy.poll_async(
+                lambda: condition(elements.count()),
+                timeout,
+                message="Timed out waiting for {}".format(what),
+            )
@@ -0,0 +1,232 @@
+"""
+Capture of screenshots, DOM and console logs when a test fails.
+
+Enabled by the SELENIUM_ARTIFACTS_DIR setting. Only the browser commands
+that fetch the data run in the test's thread; decoding, compressing and
+writing the files is done by a background thread, which gets them through
+a bounded queue (SELENIUM_ARTIFACTS_QUEUE_SIZE). If the queue is full, or
+writing the files would exceed the run's SELENIUM_ARTIFACTS_MAX_BYTES, the
+artifacts are dropped rather than slowing the tests down. Each run gets a
+subdirectory, with a subdirectory for each failed test and an index.jsonl
+file that lists them.
+"""
+
+from __future__ import absolute_import
+
+import base64
+import gzip
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+
+from selenium.common.exceptions import WebDriverException
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Returns the URL and the current DOM (rather than the source as loaded)
+CAPTURE_JS = "return [document.URL, document.documentElement.outerHTML];"
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(getattr(settings, "SELENIUM_ARTIFACTS_DIR", None))
+
+
+def get_run_id():
+    """
+    Returns the name of the run's subdirectory of SELENIUM_ARTIFACTS_DIR.
+
+    It is kept in the environment, so that processes started afterwards
+    use the same one; SeleniumTestRunner gets it before starting the
+    processes of a parallel run.
+    """
+    if "SELENIUM_ARTIFACTS_RUN" not in os.environ:
+        os.environ["SELENIUM_ARTIFACTS_RUN"] = "{}-{}".format(
+            time.strftime("%Y%m%d-%H%M%S"), os.getpid()
+        )
+    return os.environ["SELENIUM_ARTIFACTS_RUN"]
+
+
+def _capture_browser(selenium):
+    # Runs in the test's thread: only the browser commands
+    data = {}
+    try:
+        data["screenshot"] = selenium.get_screenshot_as_base64()
+    except (AttributeError, WebDriverException):
+        pass
+    try:
+        data["url"], data["dom"] = selenium.execute_script(CAPTURE_JS)
+    except WebDriverException:
+        # E.g. a driver that doesn't run Javascript
+        try:
+            data["url"], data["dom"] = selenium.current_url, selenium.page_source
+        except WebDriverException:
+            pass
+    if not getattr(selenium, "_console_log_unsupported", False):
+        try:
+            data["console"] = selenium.get_log("browser")
+        except (AttributeError, WebDriverException):
+            # Only Chromium-based browsers have it; don't ask again
+            selenium._console_log_unsupported = True
+    return data
+
+
+def capture(browsers):
+    """
+    Gets the state of browsers, for ArtifactWriter.submit().
+
+    "browsers" is a list of (name, SeleniumWrapper) tuples; the name of the
+    main browser is the empty string. Errors are ignored, since this is
+    called while handling a test failure.
+    """
+    captured = []
+    for name, selenium in browsers:
+        try:
+            captured.append((name, _capture_browser(selenium)))
+        except Exception:
+            # E.g. the browser has crashed
+            pass
+    return captured
+
+
+class ArtifactWriter(object):
+    """
+    Writes captured artifacts to "directory" in a background thread.
+    """
+
+    def __init__(self, directory, max_bytes, queue_size):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._dropped = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, test_id, captured):
+        """Queues artifacts for writing; returns False if they're dropped."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        try:
+            self._queue.put_nowait((test_id, time.time(), captured))
+            return True
+        except queue.Full:
+            self._dropped.append((test_id, time.time()))
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                sys.stderr.write("Could not write Selenium artifacts: {}\n".format(e))
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Waits until the queued artifacts have been written."""
+        self._queue.join()
+        dropped, self._dropped = self._dropped, []
+        for test_id, timestamp in dropped:
+            self._add_to_index(
+                {"test": test_id, "time": timestamp, "dropped": "queue full"}, 0
+            )
+
+    def close(self):
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _encode(captured):
+        # Returns a list of (filename, content) tuples
+        files = []
+        for name, data in captured:
+            prefix = name + "-" if name else ""
+            if data.get("screenshot"):
+                files.append(
+                    (prefix + "screenshot.png", base64.b64decode(data["screenshot"]))
+                )
+            if data.get("dom") is not None:
+                files.append(
+                    (prefix + "dom.html.gz", gzip.compress(data["dom"].encode()))
+                )
+            if data.get("console") is not None:
+                console = json.dumps(data["console"], indent=1).encode()
+                files.append((prefix + "console.json.gz", gzip.compress(console)))
+        return files
+
+    def _write(self, test_id, timestamp, captured):
+        files = self._encode(captured)
+        size = sum(len(content) for filename, content in files)
+        record = {
+            "test": test_id,
+            "time": timestamp,
+            "urls": {name: data.get("url") for name, data in captured},
+        }
+        self._add_to_index(record, size, files)
+
+    def _add_to_index(self, record, size, files=()):
+        # The index is locked while the budget is checked and the files are
+        # written, since the processes of a parallel run share it.
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "index.jsonl"), "a+") as index:
+            if fcntl is not None:
+                fcntl.flock(index, fcntl.LOCK_EX)
+            index.seek(0)
+            total = sum(json.loads(line).get("bytes", 0) for line in index if line)
+            if files and total + size > self.max_bytes:
+                record["dropped"] = "SELENIUM_ARTIFACTS_MAX_BYTES exceeded"
+            elif files:
+                subdirectory = self._make_subdirectory(record["test"])
+                for filename, content in files:
+                    with open(os.path.join(subdirectory, filename), "wb") as f:
+                        f.write(content)
+                record["directory"] = os.path.basename(subdirectory)
+                record["files"] = [filename for filename, content in files]
+                record["bytes"] = size
+            index.write(json.dumps(record) + "\n")
+
+    def _make_subdirectory(self, test_id):
+        name = re.sub(r"[^\w.\[\]=-]+", "_", test_id)[:200]
+        path = os.path.join(self.directory, name)
+        for i in range(2, sys.maxsize):
+            try:
+                os.mkdir(path)
+                return path
+            except FileExistsError:
+                path = os.path.join(self.directory, "{}-{}".format(name, i))
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter(
+                os.path.join(settings.SELENIUM_ARTIFACTS_DIR, get_run_id()),
+                getattr(settings, "SELENIUM_ARTIFACTS_MAX_BYTES", 100 * 1024 * 1024),
+                getattr(settings, "SELENIUM_ARTIFACTS_QUEUE_SIZE", 8),
+            )
+            # Like atexit, but also works in the processes of
+            # "manage.py test --parallel".
+            Finalize(_writer, _writer.close, exitpriority=5)
+        return _writer
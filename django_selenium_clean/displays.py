@@ -0,0 +1,184 @@
+"""
+Virtual X displays for browsers that don't run headless.
+
+Used for SELENIUM_WEBDRIVERS entries with "virtual_display" set. Each
+browser gets an Xvfb display of its own, started when it's first needed;
+when the browser quits, the display is kept for the next browser of the
+process, so that Xvfb isn't restarted for each test case. Xvfb chooses
+free display numbers itself, so the processes of "manage.py test
+--parallel" don't contend for them. The displays are as large as the
+largest window in SELENIUM_WIDTHS, and are stopped when the process
+exits.
+"""
+
+from __future__ import absolute_import
+
+import copy
+import os
+import select
+import subprocess
+import threading
+import time
+from importlib import import_module
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# The window height used by SeleniumWrapper.set_window_width()
+DEFAULT_HEIGHT = 1024
+
+# Seconds to wait for Xvfb to accept connections
+START_TIMEOUT = 10
+
+
+def get_size():
+    """Returns the (width, height) the displays need."""
+    widths = getattr(settings, "SELENIUM_WIDTHS", [1024])
+    return (max(widths), DEFAULT_HEIGHT)
+
+
+class VirtualDisplay(object):
+    def __init__(self, number, size, process):
+        self.number = number
+        self.size = size
+        self.process = process
+
+    @property
+    def name(self):
+        """The value of DISPLAY for programs using it, such as ":99"."""
+        return ":{}".format(self.number)
+
+    def is_running(self):
+        return self.process.poll() is None
+
+    def fits(self, size):
+        return self.size[0] >= size[0] and self.size[1] >= size[1]
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class DisplayPool(object):
+    """
+    Xvfb displays started by this process.
+
+    acquire() returns a display that no one else is using, starting one if
+    needed, and release() makes it available again.
+    """
+
+    def __init__(self, command=("Xvfb",)):
+        self.command = list(command)
+        self._free = []
+        self._all = []
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    def acquire(self, size):
+        with self._lock:
+            self._free = [d for d in self._free if d.is_running()]
+            for display in self._free:
+                if display.fits(size):
+                    self._free.remove(display)
+                    return display
+        # Several browsers starting in the background can wait for their
+        # displays at the same time.
+        return self._start(size)
+
+    def release(self, display):
+        with self._lock:
+            if display.is_running() and display not in self._free:
+                self._free.append(display)
+
+    def stop_all(self):
+        with self._lock:
+            displays, self._all, self._free = self._all, [], []
+        for display in displays:
+            display.stop()
+
+    def _start(self, size):
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(
+                self.command
+                + ["-displayfd", str(write_fd)]
+                + ["-screen", "0", "{}x{}x24".format(*size), "-nolisten", "tcp"],
+                pass_fds=(write_fd,),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except FileNotFoundError:
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries with virtual_display need Xvfb "
+                "to be installed"
+            )
+        finally:
+            os.close(write_fd)
+        try:
+            number = self._read_display_number(read_fd, process)
+        finally:
+            os.close(read_fd)
+        display = VirtualDisplay(number, size, process)
+        with self._lock:
+            self._all.append(display)
+            if self._finalizer is None:
+                # After the browsers that are reused have quit (see
+                # SeleniumWrapper._start()); like atexit, but also works in
+                # the processes of "manage.py test --parallel".
+                self._finalizer = Finalize(self, self.stop_all, exitpriority=1)
+        return display
+
+    @staticmethod
+    def _read_display_number(read_fd, process):
+        # Xvfb writes the number to the pipe once it accepts connections
+        data = b""
+        deadline = time.monotonic() + START_TIMEOUT
+        while not data.endswith(b"\n"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                process.kill()
+                process.wait()
+                raise OSError(
+                    "Xvfb did not start within {} seconds".format(START_TIMEOUT)
+                )
+            chunk = os.read(read_fd, 16)
+            if not chunk:
+                process.wait()
+                raise OSError("Xvfb exited with status {}".format(process.returncode))
+            data += chunk
+        return int(data)
+
+
+def with_display(driver_class, kwargs, display):
+    """
+    Returns driver_class's kwargs, changed so that the browser uses display.
+
+    DISPLAY is set in the environment of the driver's service (rather than
+    in os.environ, which is shared by the browsers starting at the same
+    time). If kwargs has no "service", the one of driver_class's package
+    (such as selenium.webdriver.chrome.service.Service) is created.
+    """
+    service = kwargs.get("service")
+    if service is None:
+        package = driver_class.__module__.rpartition(".")[0]
+        try:
+            service = import_module(package + ".service").Service()
+        except (ImportError, AttributeError):
+            raise ImproperlyConfigured(
+                "SELENIUM_WEBDRIVERS entries with virtual_display must "
+                'specify "service" in their kwargs'
+            )
+    else:
+        service = copy.copy(service)
+    service.env = dict(service.env, DISPLAY=display.name)
+    return dict(kwargs, service=service)
+
+
+pool = DisplayPool()
@@ -0,0 +1,188 @@
+"""
+Durations of SeleniumTestCase classes and tests, kept across runs.
+
+Enabled by the SELENIUM_DURATIONS_FILE setting. Each test process (including
+the workers of "manage.py test --parallel") adds the durations it measured
+to that JSON file when it exits, and SeleniumTestRunner uses them to decide
+the order in which test cases run.
+"""
+
+from __future__ import absolute_import
+
+import json
+import threading
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Used for estimates when nothing has been measured yet
+DEFAULT_TEST_DURATION = 1.0
+DEFAULT_BROWSER_START = 2.0
+
+
+def get_filename():
+    return getattr(settings, "SELENIUM_DURATIONS_FILE", None)
+
+
+def is_enabled():
+    return bool(get_filename())
+
+
+def get_label(test_class):
+    return "{}.{}".format(test_class.__module__, test_class.__qualname__)
+
+
+def _mean(values, default):
+    values = list(values)
+    return sum(values) / len(values) if values else default
+
+
+class Durations(object):
+    """
+    Durations measured in previous runs, in seconds.
+
+    "classes" maps the label of each test case class to a dictionary with
+    its "duration" (from the start of setUpClass() to the end of
+    tearDownClass()), its "overhead" (the part of the duration not spent
+    in tests) and its "tests" (a dictionary of test method names to
+    durations). "browser_start" is the mean time it takes to start a
+    browser.
+    """
+
+    def __init__(self, classes=None, browser_start=None):
+        self.classes = classes or {}
+        self.browser_start = browser_start
+
+    @classmethod
+    def from_json(cls, text):
+        try:
+            data = json.loads(text)
+            return cls(data["classes"], data.get("browser_start"))
+        except (ValueError, TypeError, KeyError):
+            return cls()
+
+    @classmethod
+    def load(cls, filename):
+        """Returns the durations in filename, or none if it can't be read."""
+        try:
+            with open(filename) as f:
+                return cls.from_json(f.read())
+        except OSError:
+            return cls()
+
+    def as_dict(self):
+        return {"classes": self.classes, "browser_start": self.browser_start}
+
+    def update(self, other):
+        """Replaces the durations measured again in "other"."""
+        for label, entry in other.classes.items():
+            existing = self.classes.setdefault(label, {"tests": {}})
+            existing["tests"].update(entry["tests"])
+            for key in ("duration", "overhead"):
+                if key in entry:
+                    existing[key] = entry[key]
+        if other.browser_start is not None:
+            self.browser_start = other.browser_start
+
+    def estimate(self, test_class, test_names):
+        """
+        Returns how long running the named tests of test_class will take.
+
+        Tests and classes that haven't been measured are assumed to take
+        as long as the average of those that have.
+        """
+        entry = self.classes.get(get_label(test_class), {"tests": {}})
+        all_tests = [
+            duration
+            for other in self.classes.values()
+            for duration in other["tests"].values()
+        ]
+        default = _mean(
+            entry["tests"].values(), _mean(all_tests, DEFAULT_TEST_DURATION)
+        )
+        overhead = entry.get("overhead")
+        if overhead is None:
+            overhead = _mean(
+                (
+                    other["overhead"]
+                    for other in self.classes.values()
+                    if "overhead" in other
+                ),
+                0.0,
+            )
+        return overhead + sum(entry["tests"].get(name, default) for name in test_names)
+
+    def get_browser_start(self):
+        if self.browser_start is None:
+            return DEFAULT_BROWSER_START
+        return self.browser_start
+
+
+class Recorder(object):
+    """
+    Accumulates the durations measured in this process.
+    """
+
+    def __init__(self):
+        self.durations = Durations()
+        self._test_time = {}
+        self._browser_starts = []
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    def _ensure_save_at_exit(self):
+        # Like atexit, but also works in the processes of
+        # "manage.py test --parallel".
+        if self._finalizer is None:
+            self._finalizer = Finalize(None, self.save, exitpriority=5)
+
+    def _get_class(self, test_class):
+        return self.durations.classes.setdefault(get_label(test_class), {"tests": {}})
+
+    def test(self, test_class, name, duration):
+        with self._lock:
+            self._ensure_save_at_exit()
+            self._get_class(test_class)["tests"][name] = duration
+            label = get_label(test_class)
+            self._test_time[label] = self._test_time.get(label, 0.0) + duration
+
+    def test_case(self, test_class, duration):
+        """Records a test case class, after its tests have been recorded."""
+        with self._lock:
+            self._ensure_save_at_exit()
+            entry = self._get_class(test_class)
+            test_time = self._test_time.pop(get_label(test_class), 0.0)
+            entry["duration"] = duration
+            entry["overhead"] = max(duration - test_time, 0.0)
+
+    def browser_start(self, duration):
+        with self._lock:
+            self._ensure_save_at_exit()
+            self._browser_starts.append(duration)
+            self.durations.browser_start = _mean(self._browser_starts, None)
+
+    def save(self, filename=None):
+        """
+        Adds the durations measured to those in SELENIUM_DURATIONS_FILE.
+
+        The file is locked while it is being updated, since the processes
+        of a parallel run all update it when they exit.
+        """
+        filename = filename or get_filename()
+        with self._lock, open(filename, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            durations = Durations.from_json(f.read())
+            durations.update(self.durations)
+            f.seek(0)
+            f.truncate()
+            json.dump(durations.as_dict(), f, indent=2, sort_keys=True)
+
+
+recorder = Recorder()
@@ -0,0 +1,202 @@
+"""
+Optional measurement of the time spent in browser commands and waits.
+
+Enabled by the SELENIUM_INSTRUMENTATION setting. At the end of the run,
+a summary is written to stderr and the full data to the JSON file
+specified by SELENIUM_INSTRUMENTATION_FILE.
+"""
+
+from __future__ import absolute_import
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+
+NO_TEST = "(outside tests)"
+
+
+def is_enabled():
+    return getattr(settings, "SELENIUM_INSTRUMENTATION", False)
+
+
+def _add(stats, key, duration):
+    entry = stats.setdefault(key, {"count": 0, "total": 0.0, "max": 0.0})
+    entry["count"] += 1
+    entry["total"] += duration
+    entry["max"] = max(entry["max"], duration)
+    return entry
+
+
+class Recorder(object):
+    """
+    Accumulates timings of browser commands, element lookups and waits.
+
+    Everything is also attributed to the test that is running in the
+    current thread (see the test() context manager).
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.lookups = {}
+        self.waits = {}
+        self.tests = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    @property
+    def current_test(self):
+        return getattr(self._local, "test_id", None) or NO_TEST
+
+    @contextmanager
+    def test(self, test_id):
+        self._local.test_id = test_id
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._local.test_id = None
+            with self._lock:
+                test = self._get_test(test_id)
+                test["duration"] += time.monotonic() - start
+
+    def _get_test(self, test_id):
+        return self.tests.setdefault(
+            test_id,
+            {
+                "duration": 0.0,
+                "commands": 0,
+                "command_time": 0.0,
+                "wait_time": 0.0,
+            },
+        )
+
+    def _ensure_report_at_exit(self):
+        # Like atexit, but also works in the processes of
+        # "manage.py test --parallel".
+        if self._finalizer is None:
+            self._finalizer = Finalize(None, self.report, exitpriority=5)
+
+    def command(self, name, duration):
+        with self._lock:
+            self._ensure_report_at_exit()
+            _add(self.commands, name, duration)
+            test = self._get_test(self.current_test)
+            test["commands"] += 1
+            test["command_time"] += duration
+
+    def lookup(self, locator, duration):
+        with self._lock:
+            self._ensure_report_at_exit()
+            _add(self.lookups, "{}={}".format(*locator), duration)
+
+    def wait(self, what, duration, timeout, timed_out):
+        """
+        Records a wait. "what" describes it, e.g. "displayed: id=heading".
+        """
+        with self._lock:
+            self._ensure_report_at_exit()
+            test_id = self.current_test
+            entry = _add(self.waits, (test_id, what), duration)
+            entry["timeout"] = entry.get("timeout", 0.0) + timeout
+            entry["timed_out"] = entry.get("timed_out", 0) + int(timed_out)
+            self._get_test(test_id)["wait_time"] += duration
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "commands": self.commands,
+                "lookups": self.lookups,
+                "waits": [
+                    dict(entry, test=test_id, wait=what)
+                    for (test_id, what), entry in self.waits.items()
+                ],
+                "tests": self.tests,
+            }
+
+    def summary(self, limit=10):
+        def top(stats, key):
+            return sorted(stats.items(), key=lambda item: -item[1][key])[:limit]
+
+        lines = ["Selenium instrumentation summary", ""]
+        lines.append("Slowest tests (total / in commands / in waits, seconds):")
+        for test_id, test in top(self.tests, "duration"):
+            lines.append(
+                "  {:8.3f} {:8.3f} {:8.3f}  {} ({} commands)".format(
+                    test["duration"],
+                    test["command_time"],
+                    test["wait_time"],
+                    test_id,
+                    test["commands"],
+                )
+            )
+        lines.append("Commands (total seconds, count, max seconds):")
+        for name, entry in top(self.commands, "total"):
+            lines.append(
+                "  {total:8.3f} {count:6d} {max:8.3f}  {name}".format(
+                    name=name, **entry
+                )
+            )
+        lines.append("Element lookups (total seconds, count, max seconds):")
+        for locator, entry in top(self.lookups, "total"):
+            lines.append(
+                "  {total:8.3f} {count:6d} {max:8.3f}  {locator}".format(
+                    locator=locator, **entry
+                )
+            )
+        lines.append("Waits (total seconds, count, total timeout, timeouts):")
+        for (test_id, what), entry in top(self.waits, "total"):
+            lines.append(
+                "  {total:8.3f} {count:6d} {timeout:8.3f} {timed_out:4d}  "
+                "{what} in {test_id}".format(what=what, test_id=test_id, **entry)
+            )
+        return "\n".join(lines)
+
+    def report(self):
+        """
+        Writes the summary to stderr and the data to the JSON file.
+
+        In parallel test workers, the worker number is appended to the
+        file name.
+        """
+        from . import get_worker_id
+
+        sys.stderr.write("\n" + self.summary() + "\n")
+        filename = getattr(
+            settings, "SELENIUM_INSTRUMENTATION_FILE", "selenium-instrumentation.json"
+        )
+        if get_worker_id():
+            filename = "{}.{}".format(filename, get_worker_id())
+        with open(filename, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+recorder = Recorder()
+
+
+def instrument(driver):
+    """
+    Makes driver record each command it sends to the browser.
+
+    All commands, including those of the driver's WebElements, go through
+    WebDriver.execute(), so that's what is wrapped; the commands are named
+    after its driver_command argument, such as "getTitle". Drivers without
+    it, such as NoBrowserDriver, send no commands.
+    """
+    execute = getattr(driver, "execute", None)
+    if execute is None:
+        return
+
+    def timed_execute(driver_command, params=None):
+        start = time.monotonic()
+        try:
+            return execute(driver_command, params)
+        finally:
+            recorder.command(driver_command, time.monotonic() - start)
+
+    driver.execute = timed_execute
@@ -0,0 +1,978 @@
+"""
+An in-process stand-in for a browser, for pages that need no Javascript.
+
+NoBrowserDriver implements the part of the WebDriver API that
+SeleniumWrapper, PageElement and PageElements use, with Django's test
+client instead of a browser and html.parser instead of a DOM. Use it in a
+SELENIUM_WEBDRIVERS entry:
+
+    SELENIUM_WEBDRIVERS = {
+        ...
+        "nobrowser": {
+            "callable": NoBrowserDriver,
+            "args": (),
+            "kwargs": {},
+        },
+    }
+
+The kwargs are passed to django.test.Client. Requests are handled in the
+thread of the test rather than by the live server. Links, buttons,
+checkboxes, radio buttons, options and labels can be clicked, and forms
+submitted (including file uploads); element lookups support ids, names,
+tag names, class names, link texts and CSS selectors made of type, id,
+class and attribute selectors and the descendant and child combinators.
+Javascript is not run, and stylesheets are ignored: an element is
+considered hidden only because of its "hidden" attribute, its "style"
+attribute, or its type (such as <input type="hidden"> or <script>).
+"""
+
+from __future__ import absolute_import
+
+import itertools
+import re
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urlencode, urljoin, urlsplit
+
+from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    InvalidSelectorException,
+    JavascriptException,
+    NoAlertPresentException,
+    NoSuchElementException,
+    NoSuchFrameException,
+    NoSuchWindowException,
+    StaleElementReferenceException,
+    WebDriverException,
+)
+from selenium.webdriver.common.keys import Keys
+
+VOID_ELEMENTS = frozenset(
+    "area base br col embed hr img input link meta source track wbr".split()
+)
+
+BLOCK_ELEMENTS = frozenset(
+    (
+        "address article aside blockquote dd details dialog div dl dt "
+        "fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 header hr "
+        "li main nav ol p pre section summary table tbody td tfoot th thead "
+        "tr ul"
+    ).split()
+)
+
+# Elements whose contents are never displayed
+NOT_RENDERED = frozenset("head script style template title".split())
+
+# Opening one of these elements closes the open elements of the listed
+# kinds; a simplification of HTML's implied end tags.
+IMPLIED_END_TAGS = dict.fromkeys(BLOCK_ELEMENTS, ("p",))
+IMPLIED_END_TAGS.update(
+    {
+        "li": ("li", "p"),
+        "dt": ("dt", "dd", "p"),
+        "dd": ("dt", "dd", "p"),
+        "tr": ("td", "th", "tr"),
+        "td": ("td", "th"),
+        "th": ("td", "th"),
+        "option": ("option",),
+    }
+)
+
+BOOLEAN_ATTRIBUTES = frozenset(
+    (
+        "async autofocus autoplay checked controls defer disabled hidden "
+        "ismap loop multiple muted novalidate open readonly required "
+        "reversed selected"
+    ).split()
+)
+
+URL_ATTRIBUTES = frozenset(("action", "href", "src"))
+
+# Keys that send_keys() understands; the other special keys are ignored.
+SUBMIT_KEYS = (Keys.ENTER, Keys.RETURN)
+
+BLANK_URL = "about:blank"
+
+
+class _Node(object):
+    def __init__(self, tag, attrs, parent, document):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.document = document
+        self.children = []
+        # The state of form controls
+        self.value = attrs.get("value", "")
+        self.checked = "checked" in attrs
+        self.selected = "selected" in attrs
+        if parent is not None:
+            parent.children.append(self)
+
+    def iter_descendants(self):
+        for child in self.children:
+            if isinstance(child, _Node):
+                yield child
+                for node in child.iter_descendants():
+                    yield node
+
+    def iter_ancestors(self):
+        node = self.parent
+        while node is not None and node.tag != "#document":
+            yield node
+            node = node.parent
+
+    @property
+    def type(self):
+        return self.attrs.get("type", "").lower()
+
+    @property
+    def text_content(self):
+        return "".join(
+            child if isinstance(child, str) else child.text_content
+            for child in self.children
+        )
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self, document):
+        super(_TreeBuilder, self).__init__(convert_charrefs=True)
+        self.document = document
+        self.stack = [document.root]
+
+    def handle_starttag(self, tag, attrs):
+        closes = IMPLIED_END_TAGS.get(tag, ())
+        while len(self.stack) > 1 and self.stack[-1].tag in closes:
+            self._close(self.stack.pop())
+        attrs = {name: "" if value is None else value for name, value in attrs}
+        node = _Node(tag, attrs, self.stack[-1], self.document)
+        self.document.add(node)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+        return node
+
+    def handle_startendtag(self, tag, attrs):
+        node = self.handle_starttag(tag, attrs)
+        if self.stack[-1] is node:
+            self._close(self.stack.pop())
+
+    def handle_endtag(self, tag):
+        # Close the innermost open element with that tag, and those opened
+        # after it; ignore stray end tags.
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                for node in reversed(self.stack[i:]):
+                    self._close(node)
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+    def _close(self, node):
+        if node.tag == "textarea":
+            value = node.text_content
+            node.value = value[1:] if value.startswith("\n") else value
+
+
+class _Document(object):
+    def __init__(self, url, source=""):
+        self.url = url
+        self.source = source
+        self.root = _Node("#document", {}, None, self)
+        self.elements = []
+        self.ids = {}
+        builder = _TreeBuilder(self)
+        builder.feed(source)
+        builder.close()
+
+    def add(self, node):
+        self.elements.append(node)
+        if "id" in node.attrs:
+            self.ids.setdefault(node.attrs["id"], node)
+
+    @property
+    def title(self):
+        for node in self.elements:
+            if node.tag == "title":
+                return " ".join(node.text_content.split())
+        return ""
+
+
+# CSS selectors
+
+_COMPOUND_PART = re.compile(
+    r"""
+    (?P<tag>\*|[\w-]+)
+    | \#(?P<id>[\w-]+)
+    | \.(?P<class>[\w-]+)
+    | \[\s*(?P<attr>[\w:-]+)\s*
+        (?:(?P<op>[~^$*|]?=)\s*(?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*)?
+      \]
+    | :(?P<pseudo>checked|disabled|enabled|first-child|last-child)
+    """,
+    re.VERBOSE,
+)
+
+
+def _attribute_matches(actual, op, expected):
+    if actual is None:
+        return False
+    if op is None:
+        return True
+    if op == "=":
+        return actual == expected
+    if op == "~=":
+        return expected in actual.split()
+    if op == "|=":
+        return actual == expected or actual.startswith(expected + "-")
+    if not expected:
+        return False
+    if op == "^=":
+        return actual.startswith(expected)
+    if op == "$=":
+        return actual.endswith(expected)
+    return expected in actual  # "*="
+
+
+def _siblings(node):
+    return [child for child in node.parent.children if isinstance(child, _Node)]
+
+
+def _compile_part(match):
+    if match.group("tag"):
+        tag = match.group("tag").lower()
+        return lambda node: tag == "*" or node.tag == tag
+    if match.group("id"):
+        value = match.group("id")
+        return lambda node: node.attrs.get("id") == value
+    if match.group("class"):
+        value = match.group("class")
+        return lambda node: value in node.attrs.get("class", "").split()
+    if match.group("attr"):
+        name = match.group("attr").lower()
+        op = match.group("op")
+        value = match.group("value") or ""
+        if value[:1] in ("'", '"'):
+            value = value[1:-1]
+        return lambda node: _attribute_matches(node.attrs.get(name), op, value)
+    pseudo = match.group("pseudo")
+    if pseudo == "checked":
+        return lambda node: node.checked if node.tag == "input" else node.selected
+    if pseudo == "disabled":
+        return _is_disabled
+    if pseudo == "enabled":
+        return lambda node: not _is_disabled(node)
+    if pseudo == "first-child":
+        return lambda node: _siblings(node)[0] is node
+    return lambda node: _siblings(node)[-1] is node
+
+
+def _parse_selector(selector):
+    """
+    Returns a list with an item for each comma-separated selector, which is
+    a list of (combinator, tests) tuples, one for each compound selector.
+    """
+    groups = [[]]
+    combinator = None
+    position = 0
+    while position < len(selector):
+        char = selector[position]
+        if char.isspace():
+            if groups[-1] and combinator is None:
+                combinator = " "
+            position += 1
+            continue
+        if char in ">,":
+            if not groups[-1] or combinator not in (None, " "):
+                raise InvalidSelectorException("Invalid selector: " + selector)
+            if char == ",":
+                groups.append([])
+                combinator = None
+            else:
+                combinator = ">"
+            position += 1
+            continue
+        tests = []
+        while position < len(selector):
+            match = _COMPOUND_PART.match(selector, position)
+            if match is None or (tests and match.group("tag")):
+                break
+            tests.append(_compile_part(match))
+            position = match.end()
+        if not tests or (
+            position < len(selector) and selector[position] not in " \t\n\r\f>,"
+        ):
+            raise InvalidSelectorException(
+                "Unsupported selector: {} (NoBrowserDriver supports type, id, "
+                "class and attribute selectors, and the descendant and child "
+                "combinators)".format(selector)
+            )
+        groups[-1].append((combinator, tests))
+        combinator = None
+    if not groups[-1] or combinator is not None:
+        raise InvalidSelectorException("Invalid selector: " + selector)
+    return groups
+
+
+def _matches(node, compounds, index=None):
+    if index is None:
+        index = len(compounds) - 1
+    combinator, tests = compounds[index]
+    if not all(test(node) for test in tests):
+        return False
+    if index == 0:
+        return True
+    if combinator == ">":
+        parent = node.parent
+        return parent.tag != "#document" and _matches(parent, compounds, index - 1)
+    return any(
+        _matches(ancestor, compounds, index - 1) for ancestor in node.iter_ancestors()
+    )
+
+
+# Rendering
+
+_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+
+
+def _is_hidden(node):
+    # Whether the node itself (regardless of its ancestors) is hidden
+    if node.tag in NOT_RENDERED or "hidden" in node.attrs:
+        return True
+    if node.tag == "input" and node.type == "hidden":
+        return True
+    style = node.attrs.get("style", "").replace(" ", "").lower()
+    return "display:none" in style or "visibility:hidden" in style
+
+
+def _is_displayed(node):
+    if node.tag in ("option", "optgroup"):
+        # Options are displayed along with their select element
+        node = next((a for a in node.iter_ancestors() if a.tag == "select"), node)
+    return not any(
+        _is_hidden(n) for n in itertools.chain([node], node.iter_ancestors())
+    )
+
+
+def _render_text(node, parts):
+    for child in node.children:
+        if isinstance(child, str):
+            parts.append(_WHITESPACE.sub(" ", child))
+        elif child.tag == "br":
+            parts.append("\n")
+        elif not _is_hidden(child):
+            block = child.tag in BLOCK_ELEMENTS
+            if block:
+                parts.append("\n")
+            _render_text(child, parts)
+            if block:
+                parts.append("\n")
+
+
+def _get_text(node):
+    # Like the text of a WebElement: the displayed text, with the lines of
+    # block elements separated by newlines and other whitespace collapsed.
+    if not _is_displayed(node):
+        return ""
+    parts = []
+    _render_text(node, parts)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _is_disabled(node):
+    if node.tag not in ("button", "fieldset", "input", "optgroup", "option", "select"):
+        if node.tag != "textarea":
+            return False
+    if "disabled" in node.attrs:
+        return True
+    return any(
+        ancestor.tag in ("fieldset", "optgroup", "select")
+        and "disabled" in ancestor.attrs
+        for ancestor in node.iter_ancestors()
+    )
+
+
+def _option_value(option):
+    if "value" in option.attrs:
+        return option.attrs["value"]
+    return " ".join(option.text_content.split())
+
+
+class NoBrowserElement(object):
+    """
+    An element of a page loaded by NoBrowserDriver.
+
+    Like a WebElement, it becomes stale when its window navigates.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, driver, node):
+        self.parent = driver
+        self._node = node
+        self.id = "nobrowser-element-{}".format(next(self._ids))
+
+    def __eq__(self, other):
+        return isinstance(other, NoBrowserElement) and self._node is other._node
+
+    def __hash__(self):
+        return hash(self._node)
+
+    def __repr__(self):
+        return "<NoBrowserElement {} {}>".format(self._node.tag, self._node.attrs)
+
+    def _get_node(self):
+        window = self.parent._windows.get(self.parent._current_handle)
+        if window is None or window.document is not self._node.document:
+            raise StaleElementReferenceException(
+                "The element's page is no longer loaded"
+            )
+        return self._node
+
+    @property
+    def tag_name(self):
+        return self._get_node().tag
+
+    @property
+    def text(self):
+        return _get_text(self._get_node())
+
+    def get_dom_attribute(self, name):
+        return self._get_node().attrs.get(name.lower())
+
+    def get_property(self, name):
+        node = self._get_node()
+        if name in ("value", "checked", "selected"):
+            if node.tag == "option" and name == "value":
+                return _option_value(node)
+            return getattr(node, name)
+        if name in ("textContent", "innerText"):
+            return node.text_content if name == "textContent" else _get_text(node)
+        return node.attrs.get(name.lower())
+
+    def get_attribute(self, name):
+        node = self._get_node()
+        name = name.lower()
+        if name == "value" and node.tag in ("input", "option", "textarea"):
+            return self.get_property("value")
+        if name in ("checked", "selected"):
+            return "true" if getattr(node, name) else None
+        if name in BOOLEAN_ATTRIBUTES:
+            return "true" if name in node.attrs else None
+        if name == "innertext":
+            return _get_text(node)
+        if name == "textcontent":
+            return node.text_content
+        if name in URL_ATTRIBUTES and name in node.attrs:
+            return urljoin(node.document.url, node.attrs[name])
+        return node.attrs.get(name)
+
+    def is_displayed(self):
+        return _is_displayed(self._get_node())
+
+    def is_enabled(self):
+        return not _is_disabled(self._get_node())
+
+    def is_selected(self):
+        node = self._get_node()
+        if node.tag == "option":
+            return node.selected
+        return node.tag == "input" and node.checked
+
+    def find_element(self, by, value):
+        return self.parent._find_element(by, value, self._get_node())
+
+    def find_elements(self, by, value):
+        return self.parent._find_elements(by, value, self._get_node())
+
+    def click(self):
+        self.parent._click(self._get_node())
+
+    def send_keys(self, *value):
+        self.parent._send_keys(self._get_node(), "".join(str(v) for v in value))
+
+    def clear(self):
+        node = self._get_node()
+        if node.tag not in ("input", "textarea"):
+            raise ElementNotInteractableException("Element can't be cleared")
+        node.value = ""
+
+    def submit(self):
+        node = self._get_node()
+        form = node if node.tag == "form" else self.parent._get_form(node)
+        if form is None:
+            raise WebDriverException("The element is not in a form")
+        self.parent._submit(form)
+
+
+class _Window(object):
+    def __init__(self, handle):
+        self.handle = handle
+        self.history = [_Document(BLANK_URL)]
+        self.index = 0
+
+    @property
+    def document(self):
+        return self.history[self.index]
+
+    def load(self, document):
+        self.history = self.history[: self.index + 1]
+        self.history.append(document)
+        self.index += 1
+
+
+class _SwitchTo(object):
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        if handle not in self._driver._windows:
+            raise NoSuchWindowException("No window with handle " + handle)
+        self._driver._current_handle = handle
+
+    def new_window(self, type_hint=None):
+        self._driver._current_handle = self._driver._new_window().handle
+
+    def default_content(self):
+        pass
+
+    def parent_frame(self):
+        pass
+
+    def frame(self, frame_reference):
+        raise NoSuchFrameException("NoBrowserDriver doesn't support frames")
+
+    @property
+    def alert(self):
+        raise NoAlertPresentException()
+
+
+class NoBrowserDriver(object):
+    """
+    Loads pages with Django's test client instead of a browser.
+
+    See the module's docstring for what it can do.
+    """
+
+    _handles = itertools.count(1)
+
+    def __init__(self, **client_kwargs):
+        from django.test import Client
+
+        self._client = Client(**client_kwargs)
+        self._windows = {}
+        self._current_handle = self._new_window().handle
+        self._window_size = {"width": 1024, "height": 768}
+        self.switch_to = _SwitchTo(self)
+        self.capabilities = {"browserName": "nobrowser", "browserVersion": ""}
+
+    def _new_window(self):
+        window = _Window("nobrowser-window-{}".format(next(self._handles)))
+        self._windows[window.handle] = window
+        return window
+
+    def _check_running(self):
+        if self._client is None:
+            raise WebDriverException("The driver has quit")
+
+    @property
+    def _window(self):
+        self._check_running()
+        window = self._windows.get(self._current_handle)
+        if window is None:
+            raise NoSuchWindowException("The current window has been closed")
+        return window
+
+    # Navigation
+
+    def _load(self, url, method="get", data=None, window=None):
+        window = window or self._window
+        url = urljoin(window.document.url, url)
+        if url == BLANK_URL:
+            window.load(_Document(url))
+            return
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise WebDriverException("NoBrowserDriver can't open " + url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        response = getattr(self._client, method)(
+            path,
+            data,
+            follow=True,
+            secure=parts.scheme == "https",
+            HTTP_HOST=parts.netloc,
+        )
+        for redirect_url, status_code in response.redirect_chain:
+            url = urljoin(url, redirect_url)
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        source = content.decode(response.charset or "utf-8", "replace")
+        window.load(_Document(urldefrag(url)[0], source))
+
+    def get(self, url):
+        self._load(url)
+
+    def back(self):
+        window = self._window
+        window.index = max(window.index - 1, 0)
+
+    def forward(self):
+        window = self._window
+        window.index = min(window.index + 1, len(window.history) - 1)
+
+    def refresh(self):
+        self._load(self.current_url)
+
+    @property
+    def current_url(self):
+        return self._window.document.url
+
+    @property
+    def title(self):
+        return self._window.document.title
+
+    @property
+    def page_source(self):
+        return self._window.document.source
+
+    # Windows
+
+    @property
+    def window_handles(self):
+        self._check_running()
+        return list(self._windows)
+
+    @property
+    def current_window_handle(self):
+        return self._window.handle
+
+    def close(self):
+        del self._windows[self._window.handle]
+
+    def quit(self):
+        self._windows.clear()
+        self._client = None
+
+    def get_window_size(self, windowHandle="current"):
+        return dict(self._window_size)
+
+    def set_window_size(self, width, height, windowHandle="current"):
+        self._window_size = {"width": int(width), "height": int(height)}
+
+    def maximize_window(self):
+        pass
+
+    def set_script_timeout(self, time_to_wait):
+        pass
+
+    def set_page_load_timeout(self, time_to_wait):
+        pass
+
+    def implicitly_wait(self, time_to_wait):
+        pass
+
+    # Cookies
+
+    def get_cookies(self):
+        return [
+            {
+                "name": name,
+                "value": morsel.value,
+                "path": morsel["path"] or "/",
+                "domain": morsel["domain"],
+                "secure": bool(morsel["secure"]),
+                "httpOnly": bool(morsel["httponly"]),
+            }
+            for name, morsel in self._client.cookies.items()
+            # Cookies deleted by the server
+            if str(morsel["max-age"]) != "0"
+        ]
+
+    def get_cookie(self, name):
+        for cookie in self.get_cookies():
+            if cookie["name"] == name:
+                return cookie
+        return None
+
+    def add_cookie(self, cookie_dict):
+        name = cookie_dict["name"]
+        # Rather than updating the existing cookie, whose attributes (such as
+        # the max-age=0 of a cookie the server has deleted) would remain
+        self._client.cookies.pop(name, None)
+        self._client.cookies[name] = cookie_dict["value"]
+        morsel = self._client.cookies[name]
+        morsel["path"] = cookie_dict.get("path") or "/"
+        for key in ("domain", "expiry"):
+            if cookie_dict.get(key):
+                morsel["domain" if key == "domain" else "expires"] = cookie_dict[key]
+        if cookie_dict.get("secure"):
+            morsel["secure"] = True
+        if cookie_dict.get("httpOnly"):
+            morsel["httponly"] = True
+
+    def delete_cookie(self, name):
+        self._client.cookies.pop(name, None)
+
+    def delete_all_cookies(self):
+        self._client.cookies.clear()
+
+    # Scripts
+
+    def execute_script(self, script, *args):
+        from . import COLLECT_JS, SNAPSHOT_JS
+
+        # The scripts of SeleniumWrapper.snapshot() and PageElements are
+        # emulated.
+        if script == SNAPSHOT_JS:
+            return self._snapshot(*args)
+        if script == COLLECT_JS:
+            return self._collect(*args)
+        raise JavascriptException("NoBrowserDriver doesn't run Javascript")
+
+    def execute_async_script(self, script, *args):
+        raise JavascriptException("NoBrowserDriver doesn't run Javascript")
+
+    def _snapshot(self, locators, attributes):
+        result = []
+        for by, value in locators:
+            elements = self.find_elements(by, value)
+            if not elements:
+                result.append(None)
+                continue
+            element = elements[0]
+            displayed = element.is_displayed()
+            values = {name: element.get_dom_attribute(name) for name in attributes}
+            result.append([displayed, element.text if displayed else "", values])
+        return result
+
+    def _collect(self, locator, what, name=None):
+        elements = self.find_elements(*locator)
+        if what == "count":
+            return len(elements)
+        if what == "text":
+            return [element.text for element in elements]
+        return [element.get_dom_attribute(name) for element in elements]
+
+    # Finding elements
+
+    def find_element(self, by, value):
+        return self._find_element(by, value, None)
+
+    def find_elements(self, by, value):
+        return self._find_elements(by, value, None)
+
+    def _find_element(self, by, value, context):
+        elements = self._find_elements(by, value, context, first=True)
+        if not elements:
+            raise NoSuchElementException(
+                "Unable to locate element: {}={}".format(by, value)
+            )
+        return elements[0]
+
+    def _find_elements(self, by, value, context, first=False):
+        document = self._window.document
+        if context is None:
+            candidates = document.elements
+            if by == "id":
+                node = document.ids.get(value)
+                candidates = [node] if node is not None and first else candidates
+        else:
+            candidates = list(context.iter_descendants())
+        if by == "id":
+            nodes = (n for n in candidates if n.attrs.get("id") == value)
+        elif by == "name":
+            nodes = (n for n in candidates if n.attrs.get("name") == value)
+        elif by == "tag name":
+            nodes = (n for n in candidates if n.tag == value.lower())
+        elif by == "class name":
+            nodes = (n for n in candidates if value in n.attrs.get("class", "").split())
+        elif by == "css selector":
+            groups = _parse_selector(value)
+            nodes = (n for n in candidates if any(_matches(n, g) for g in groups))
+        elif by in ("link text", "partial link text"):
+            nodes = (
+                n
+                for n in candidates
+                if n.tag == "a"
+                and (
+                    _get_text(n) == value
+                    if by == "link text"
+                    else value in _get_text(n)
+                )
+            )
+        else:
+            raise InvalidSelectorException(
+                "NoBrowserDriver doesn't support locating elements by " + by
+            )
+        if first:
+            nodes = itertools.islice(nodes, 1)
+        return [NoBrowserElement(self, node) for node in nodes]
+
+    # Interaction
+
+    def _click(self, node):
+        if _is_disabled(node):
+            return
+        link = next(
+            (n for n in itertools.chain([node], node.iter_ancestors()) if n.tag == "a"),
+            None,
+        )
+        if node.tag == "label":
+            control = self._get_labeled_control(node)
+            if control is not None:
+                self._click(control)
+        elif node.tag == "input" and node.type == "checkbox":
+            node.checked = not node.checked
+        elif node.tag == "input" and node.type == "radio":
+            self._check_radio(node)
+        elif node.tag == "option":
+            self._select_option(node)
+        elif self._is_submit_button(node):
+            form = self._get_form(node)
+            if form is not None:
+                self._submit(form, node)
+        elif link is not None and "href" in link.attrs:
+            window = None
+            if link.attrs.get("target") == "_blank":
+                window = self._new_window()
+            self._load(link.attrs["href"], window=window)
+
+    @staticmethod
+    def _is_submit_button(node):
+        if node.tag == "button":
+            return node.type in ("", "submit")
+        return node.tag == "input" and node.type in ("submit", "image")
+
+    def _get_labeled_control(self, label):
+        if "for" in label.attrs:
+            return label.document.ids.get(label.attrs["for"])
+        return next(
+            (
+                n
+                for n in label.iter_descendants()
+                if n.tag in ("button", "input", "select", "textarea")
+            ),
+            None,
+        )
+
+    def _check_radio(self, node):
+        form = self._get_form(node)
+        for other in node.document.elements:
+            if (
+                other.tag == "input"
+                and other.type == "radio"
+                and other.attrs.get("name") == node.attrs.get("name")
+                and self._get_form(other) is form
+            ):
+                other.checked = False
+        node.checked = True
+
+    def _select_option(self, node):
+        select = next((a for a in node.iter_ancestors() if a.tag == "select"), None)
+        if select is not None and "multiple" in select.attrs:
+            node.selected = not node.selected
+            return
+        if select is not None:
+            for option in select.iter_descendants():
+                option.selected = False
+        node.selected = True
+
+    def _send_keys(self, node, text):
+        text_field = node.tag == "textarea" or (
+            node.tag == "input"
+            and node.type not in ("button", "checkbox", "image", "radio", "reset")
+            and node.type not in ("submit", "hidden")
+        )
+        if not text_field or _is_disabled(node) or not _is_displayed(node):
+            raise ElementNotInteractableException("Element is not a text field")
+        if node.type == "file":
+            node.value = text
+            return
+        for char in text:
+            if char in SUBMIT_KEYS and node.tag == "input":
+                form = self._get_form(node)
+                if form is not None:
+                    self._submit(form)
+                return
+            if char == Keys.BACKSPACE:
+                node.value = node.value[:-1]
+            elif char in SUBMIT_KEYS:
+                node.value += "\n"
+            # Other special keys (in the private use area) are ignored
+            elif not "\ue000" <= char <= "\uf8ff":
+                node.value += char
+
+    def _get_form(self, node):
+        if "form" in node.attrs:
+            form = node.document.ids.get(node.attrs["form"])
+            return form if form is not None and form.tag == "form" else None
+        return next((a for a in node.iter_ancestors() if a.tag == "form"), None)
+
+    def _get_form_data(self, form, submitter):
+        # Returns the name/value pairs of the form's controls, and the paths
+        # of the files to upload
+        pairs = []
+        files = []
+        for node in form.document.elements:
+            name = node.attrs.get("name")
+            if not name or _is_disabled(node) or self._get_form(node) is not form:
+                continue
+            if node.tag == "input":
+                if node.type in ("button", "image", "reset", "submit"):
+                    if node is submitter:
+                        pairs.append((name, node.attrs.get("value", "")))
+                elif node.type in ("checkbox", "radio"):
+                    if node.checked:
+                        pairs.append((name, node.attrs.get("value", "on")))
+                elif node.type == "file":
+                    if node.value:
+                        files.append((name, node.value))
+                else:
+                    pairs.append((name, node.value))
+            elif node.tag == "button":
+                if node is submitter:
+                    pairs.append((name, node.attrs.get("value", "")))
+            elif node.tag == "textarea":
+                pairs.append((name, node.value))
+            elif node.tag == "select":
+                options = [n for n in node.iter_descendants() if n.tag == "option"]
+                selected = [option for option in options if option.selected]
+                if not selected and options and "multiple" not in node.attrs:
+                    selected = options[:1]
+                pairs.extend((name, _option_value(option)) for option in selected)
+        return pairs, files
+
+    def _submit(self, form, submitter=None):
+        if submitter is None:
+            submitter = next(
+                (
+                    n
+                    for n in form.document.elements
+                    if self._is_submit_button(n) and self._get_form(n) is form
+                ),
+                None,
+            )
+        attrs = submitter.attrs if submitter is not None else {}
+        method = (attrs.get("formmethod") or form.attrs.get("method") or "get").lower()
+        action = attrs.get("formaction") or form.attrs.get("action") or ""
+        pairs, files = self._get_form_data(form, submitter)
+        if method != "post":
+            action = urljoin(form.document.url, action).split("?")[0]
+            self._load(action + "?" + urlencode(pairs))
+            return
+        data = {}
+        for name, value in pairs:
+            data.setdefault(name, []).append(value)
+        opened = []
+        try:
+            for name, path in files:
+                opened.append(open(path, "rb"))
+                data.setdefault(name, []).append(opened[-1])
+            self._load(action, method="post", data=data)
+        finally:
+            for f in opened:
+                f.close()
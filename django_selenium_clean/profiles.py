@@ -0,0 +1,75 @@
+"""
+Cloning of browser profile directories.
+
+Used for the "template_profile" option of SELENIUM_WEBDRIVERS entries.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# From linux/fs.h; makes the target file share the source file's data
+# blocks (copy-on-write), on file systems that support it, such as Btrfs
+# and XFS.
+FICLONE = 0x40049409
+
+# Files that a running browser keeps in its profile directory to prevent
+# other instances from using it.
+LOCK_FILES = (
+    "SingletonLock",
+    "SingletonSocket",
+    "SingletonCookie",
+    "lock",
+    ".parentlock",
+    "parent.lock",
+)
+
+# Whether FICLONE has worked so far; it is no longer tried after it fails
+# because the file system doesn't support it.
+_reflink_supported = fcntl is not None
+
+
+def clone_file(source, destination):
+    """
+    Copies a file, sharing its data with the original if possible.
+    """
+    global _reflink_supported
+    if _reflink_supported:
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, destination)
+            return destination
+        except OSError as e:
+            if e.errno not in (
+                errno.EOPNOTSUPP,
+                errno.ENOTTY,
+                errno.EXDEV,
+                errno.EINVAL,
+                errno.ENOSYS,
+            ):
+                raise
+            _reflink_supported = False
+    return shutil.copy2(source, destination)
+
+
+def clone_profile(template, destination):
+    """
+    Copies the template profile directory to destination, which may exist.
+
+    Lock files left by the browser are not copied.
+    """
+    shutil.copytree(
+        template,
+        destination,
+        symlinks=True,
+        ignore=shutil.ignore_patterns(*LOCK_FILES),
+        copy_function=clone_file,
+        dirs_exist_ok=True,
+    )
@@ -0,0 +1,304 @@
+"""
+Managed connections to remote WebDriver servers, such as Selenium Grid.
+
+Used for SELENIUM_WEBDRIVERS entries with a "remote" key. The drivers
+created for such entries share, per server and browser, a pool of
+keep-alive HTTP connections with the configured timeouts. If
+"reuse_sessions" is set, quitting doesn't end the session; it is parked in
+a SessionBroker instead, and the next browser needed for the same entry,
+in this process or another, takes it over rather than waiting for the
+server to create a new one.
+"""
+
+from __future__ import absolute_import
+
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from urllib3 import Timeout
+
+try:
+    from selenium.webdriver.remote.client_config import ClientConfig
+except ImportError:  # Selenium < 4.26
+    ClientConfig = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_OPTIONS = {
+    # Seconds to wait for a response (creating a session may involve
+    # waiting in the grid's queue)
+    "timeout": 120,
+    "connect_timeout": 10,
+    # Connections kept open to each server
+    "pool_size": 8,
+    "reuse_sessions": False,
+    # Seconds after which a parked session is no longer reused; it must be
+    # less than the server's idle session timeout (300 for Selenium Grid).
+    "max_idle": 240,
+}
+
+DEFAULT_URL = "http://127.0.0.1:4444"
+
+# Maps (url, browser name, timeouts, pool size) to the RemoteConnection
+# shared by the drivers with these options; each driver gets a copy of it
+# (see _share()).
+_connections = {}
+_connections_lock = threading.Lock()
+
+# Maps driver classes to their ManagedRemoteMixin subclasses
+_managed_classes = {}
+
+
+def get_options(config):
+    """Returns the "remote" options of a SELENIUM_WEBDRIVERS entry."""
+    options = config.get("remote")
+    return dict(DEFAULT_OPTIONS, **(options if isinstance(options, dict) else {}))
+
+
+def _end_session(session):
+    # Best effort; the server ends idle sessions eventually anyway.
+    request = urllib.request.Request(
+        "{}/session/{}".format(session["url"].rstrip("/"), session["session_id"]),
+        method="DELETE",
+    )
+    try:
+        urllib.request.urlopen(request, timeout=10).close()
+    except Exception:
+        pass
+
+
+def _keep_open():
+    pass
+
+
+def _share(connection):
+    """
+    Returns a copy of connection that uses the same pool of HTTP connections.
+
+    WebDriver.quit() closes the driver's command_executor, which would
+    close the pool for all the drivers that share it; closing the copy
+    does nothing. The pool is closed when the process exits.
+    """
+    shared = copy.copy(connection)
+    shared.close = _keep_open
+    return shared
+
+
+class SessionBroker(object):
+    """
+    Remote sessions that are not in use, kept in a JSON file.
+
+    The file is locked while it is used, so all the processes running
+    tests on the machine can share it. Its name is specified by the
+    SELENIUM_SESSION_BROKER_FILE setting.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(
+                settings,
+                "SELENIUM_SESSION_BROKER_FILE",
+                os.path.join(tempfile.gettempdir(), "django-selenium-clean-sessions"),
+            )
+        )
+
+    @contextmanager
+    def _sessions(self):
+        with open(self.filename, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                sessions = json.loads(f.read() or "[]")
+            except ValueError:
+                sessions = []
+            yield sessions
+            f.seek(0)
+            f.truncate()
+            json.dump(sessions, f, indent=2)
+
+    def park(self, key, url, session_id, capabilities, max_idle):
+        with self._sessions() as sessions:
+            sessions.append(
+                {
+                    "key": key,
+                    "url": url,
+                    "session_id": session_id,
+                    "capabilities": capabilities,
+                    "expires": time.time() + max_idle,
+                }
+            )
+
+    def take(self, key):
+        """
+        Removes a parked session with that key and returns it, or None.
+
+        The most recently parked session is returned. Expired sessions are
+        removed and ended.
+        """
+        now = time.time()
+        result = None
+        with self._sessions() as sessions:
+            expired = [s for s in sessions if s["expires"] <= now]
+            sessions[:] = [s for s in sessions if s["expires"] > now]
+            for session in reversed(sessions):
+                if session["key"] == key:
+                    sessions.remove(session)
+                    result = session
+                    break
+        for session in expired:
+            _end_session(session)
+        return result
+
+    def end_all(self):
+        """Ends all parked sessions, e.g. at the end of a CI job."""
+        with self._sessions() as sessions:
+            parked = list(sessions)
+            del sessions[:]
+        for session in parked:
+            _end_session(session)
+
+
+class ManagedRemoteMixin(object):
+    """
+    Mixed into the driver class of SELENIUM_WEBDRIVERS entries with a
+    "remote" key, so that drivers can take over a parked session.
+    """
+
+    broker = None
+    broker_key = None
+    broker_url = None
+    max_idle = None
+
+    def __init__(self, *args, **kwargs):
+        self._reused_session = kwargs.pop("reused_session", None)
+        super(ManagedRemoteMixin, self).__init__(*args, **kwargs)
+
+    def start_session(self, capabilities, *args, **kwargs):
+        if self._reused_session is None:
+            return super(ManagedRemoteMixin, self).start_session(
+                capabilities, *args, **kwargs
+            )
+        self.session_id = self._reused_session["session_id"]
+        self.caps = self._reused_session["capabilities"]
+
+    def park(self):
+        """Puts the session in the broker instead of ending it."""
+        self.broker.park(
+            self.broker_key, self.broker_url, self.session_id, self.caps, self.max_idle
+        )
+        self.session_id = None
+
+
+def _get_managed_class(driver_class):
+    if not (isinstance(driver_class, type) and issubclass(driver_class, WebDriver)):
+        raise ImproperlyConfigured(
+            'The callable of SELENIUM_WEBDRIVERS entries with "remote" must be '
+            "webdriver.Remote or a subclass"
+        )
+    if driver_class not in _managed_classes:
+        _managed_classes[driver_class] = type(
+            "Managed" + driver_class.__name__, (ManagedRemoteMixin, driver_class), {}
+        )
+    return _managed_classes[driver_class]
+
+
+def create_driver(driver_class, args, kwargs, options):
+    """
+    Creates a driver for a SELENIUM_WEBDRIVERS entry with a "remote" key.
+
+    args, kwargs and options are those of the entry ("options" being the
+    result of get_options()).
+    """
+    if ClientConfig is None:
+        raise ImproperlyConfigured(
+            'SELENIUM_WEBDRIVERS entries with "remote" need Selenium 4.26 or later'
+        )
+    args = list(args)
+    kwargs = dict(kwargs)
+    url = args.pop(0) if args else kwargs.pop("command_executor", DEFAULT_URL)
+    capabilities = kwargs["options"].to_capabilities()
+    connection_key = (
+        url,
+        capabilities.get("browserName"),
+        options["timeout"],
+        options["connect_timeout"],
+        options["pool_size"],
+    )
+    with _connections_lock:
+        connection = _connections.get(connection_key)
+    if connection is None:
+        kwargs["client_config"] = ClientConfig(
+            url,
+            keep_alive=True,
+            timeout=Timeout(
+                connect=options["connect_timeout"], read=options["timeout"]
+            ),
+            init_args_for_pool_manager={
+                "init_args_for_pool_manager": {"maxsize": options["pool_size"]}
+            },
+        )
+    managed_class = _get_managed_class(driver_class)
+
+    broker = None
+    driver = None
+    if options["reuse_sessions"]:
+        broker = SessionBroker.from_settings()
+        session_key = hashlib.sha256(
+            json.dumps([url, capabilities], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        while driver is None:
+            session = broker.take(session_key)
+            if session is None:
+                break
+            driver = managed_class(
+                *args,
+                command_executor=_share(connection) if connection else url,
+                reused_session=session,
+                **kwargs
+            )
+            try:
+                driver.window_handles
+            except WebDriverException:
+                # The server has ended it
+                driver = None
+    if driver is None:
+        driver = managed_class(
+            *args, command_executor=_share(connection) if connection else url, **kwargs
+        )
+    if broker is not None:
+        driver.broker = broker
+        driver.broker_key = session_key
+        driver.broker_url = url
+        driver.max_idle = options["max_idle"]
+    if connection is None:
+        with _connections_lock:
+            connection = _connections.setdefault(
+                connection_key, driver.command_executor
+            )
+        if connection is driver.command_executor:
+            # After the browsers that are reused have been parked (see
+            # SeleniumWrapper._start())
+            Finalize(None, connection.close, exitpriority=1)
+            driver.command_executor = _share(connection)
+    return driver
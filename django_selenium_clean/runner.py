@@ -0,0 +1,125 @@
+from __future__ import absolute_import
+
+import os
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner, ParallelTestSuite
+
+from . import artifacts, durations
+
+try:
+    from django.test.runner import get_max_test_processes
+except ImportError:  # Django < 4.0
+    from django.test.runner import default_test_processes as get_max_test_processes
+
+
+def get_driver_id(test_class):
+    """
+    Returns the SELENIUM_WEBDRIVERS key test_class uses, or None.
+
+    None means that test_class doesn't use a browser.
+    """
+    from . import SeleniumTestCase
+
+    if not issubclass(test_class, SeleniumTestCase):
+        return None
+    return test_class.selenium_webdriver or os.environ.get(
+        "SELENIUM_WEBDRIVER", "default"
+    )
+
+
+def schedule(jobs, processes, switch_cost=0.0):
+    """
+    Orders jobs so that running them on "processes" workers ends early.
+
+    Each job is a (duration, driver_id, item) tuple, and the workers take
+    the next job from the result whenever they finish one. The order is
+    found by simulating this: the first free worker gets the longest
+    remaining job, except that jobs using a different browser than the
+    one the worker last used count as switch_cost seconds shorter (with
+    SELENIUM_REUSE_BROWSER, changing browsers means starting a new one).
+    Jobs whose driver_id is None don't use a browser. Returns the items.
+    """
+    remaining = sorted(jobs, key=lambda job: -job[0])
+    workers = [(0.0, i, None) for i in range(max(processes, 1))]
+    result = []
+    while remaining:
+        workers.sort(key=lambda worker: worker[:2])
+        free_at, i, current_driver = workers[0]
+
+        def priority(job):
+            duration, driver_id, item = job
+            if driver_id not in (None, current_driver) and current_driver:
+                return duration - switch_cost
+            return duration
+
+        job = max(remaining, key=priority)
+        remaining.remove(job)
+        duration, driver_id, item = job
+        if driver_id not in (None, current_driver):
+            if current_driver:
+                duration += switch_cost
+            current_driver = driver_id
+        workers[0] = (free_at + duration, i, current_driver)
+        result.append(item)
+    return result
+
+
+class SeleniumTestRunner(DiscoverRunner):
+    """
+    A test runner that runs tests in parallel by default.
+
+    The number of parallel processes is taken from the SELENIUM_PARALLEL
+    setting (an integer or "auto") unless --parallel is specified in the
+    command line. Each process gets its own browser and its own live
+    server.
+
+    If SELENIUM_DURATIONS_FILE is set, the test cases are scheduled on the
+    processes according to the durations measured in previous runs (see
+    schedule()), unless --shuffle or --reverse is specified.
+    """
+
+    def __init__(self, parallel=0, **kwargs):
+        if not parallel:
+            parallel = getattr(settings, "SELENIUM_PARALLEL", 0)
+            if parallel == "auto":
+                parallel = get_max_test_processes()
+        super(SeleniumTestRunner, self).__init__(parallel=parallel, **kwargs)
+
+    def setup_test_environment(self, **kwargs):
+        super(SeleniumTestRunner, self).setup_test_environment(**kwargs)
+        if artifacts.is_enabled():
+            # Before the parallel processes start, so that they share the
+            # run's SELENIUM_ARTIFACTS_DIR subdirectory
+            artifacts.get_run_id()
+
+    def build_suite(self, *args, **kwargs):
+        suite = super(SeleniumTestRunner, self).build_suite(*args, **kwargs)
+        if (
+            isinstance(suite, ParallelTestSuite)
+            and durations.is_enabled()
+            and not getattr(self, "shuffle", False)
+            and not self.reverse
+        ):
+            self.schedule_subsuites(suite)
+        return suite
+
+    def schedule_subsuites(self, suite):
+        from . import SeleniumWrapper
+
+        previous = durations.Durations.load(durations.get_filename())
+        jobs = []
+        for subsuite in suite.subsuites:
+            tests = list(subsuite)
+            test_class = type(tests[0])
+            driver_id = get_driver_id(test_class)
+            duration = 0.0
+            if driver_id is not None:
+                duration = previous.estimate(
+                    test_class, [test._testMethodName for test in tests]
+                )
+            jobs.append((duration, driver_id, subsuite))
+        switch_cost = 0.0
+        if SeleniumWrapper.reuse_browser():
+            switch_cost = previous.get_browser_start()
+        suite.subsuites = schedule(jobs, suite.processes, switch_cost)
@@ -0,0 +1,101 @@
+"""
+Tracking of the requests being served by the live server.
+
+SeleniumTestCase wraps the live server's WSGI application with
+ServerActivity.wrap(), so that SeleniumWrapper.wait_until_server_idle()
+can tell when the server has finished serving the browser.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+
+class _ClosingIterator(object):
+    # Wraps a WSGI response, calling on_close when the server closes it,
+    # i.e. after the whole response has been sent.
+
+    def __init__(self, result, on_close):
+        self._result = result
+        self._iterator = iter(result)
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    def close(self):
+        try:
+            if hasattr(self._result, "close"):
+                self._result.close()
+        finally:
+            self._on_close()
+
+
+class ServerActivity(object):
+    """
+    Counts the requests that are being served.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self._last_activity = time.monotonic()
+        self._condition = threading.Condition()
+
+    def wrap(self, application):
+        """Returns a WSGI application that calls "application" and counts."""
+
+        def tracked_application(environ, start_response):
+            self._started()
+            try:
+                result = application(environ, start_response)
+            except BaseException:
+                self._finished()
+                raise
+            return _ClosingIterator(result, self._finished)
+
+        return tracked_application
+
+    def _started(self):
+        with self._condition:
+            self.in_flight += 1
+            self.requests += 1
+            self._last_activity = time.monotonic()
+
+    def _finished(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._last_activity = time.monotonic()
+            self._condition.notify_all()
+
+    def wait_until_idle(self, timeout, idle_time):
+        """
+        Waits until no request has been served for idle_time seconds.
+
+        Raises TimeoutException if this doesn't happen within "timeout"
+        seconds.
+        """
+        end_time = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                remaining = end_time - now
+                if self.in_flight == 0:
+                    idle = now - self._last_activity
+                    if idle >= idle_time:
+                        return
+                    delay = idle_time - idle
+                else:
+                    delay = remaining
+                if remaining <= 0:
+                    raise TimeoutException(
+                        "The live server was still busy after {} seconds "
+                        "({} requests in flight)".format(timeout, self.in_flight)
+                    )
+                self._condition.wait(min(delay, remaining))
@@ -0,0 +1,169 @@
+"""
+Static file serving for the live server, with in-memory caching.
+
+Used by SeleniumTestCase when SELENIUM_CACHE_STATIC_FILES is set.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Like FileResponse, serve compressed files as such rather than with a
+# Content-Encoding.
+ENCODED_TYPES = {
+    "bzip2": "application/x-bzip",
+    "gzip": "application/gzip",
+    "xz": "application/x-xz",
+    "br": "application/x-brotli",
+}
+
+COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def _accepted_encodings(request):
+    result = set()
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = item.partition(";")
+        params = params.strip()
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1
+        except ValueError:
+            q = 1
+        if q > 0:
+            result.add(name.strip().lower())
+    return result
+
+
+class _StaticFile(object):
+    def __init__(self, content, content_type):
+        self.content = content
+        self.content_type = content_type
+        self.etag = hashlib.sha1(content).hexdigest()
+        self._variants = {}
+
+    def is_compressible(self):
+        return (
+            self.content_type.startswith("text/")
+            or self.content_type in COMPRESSIBLE_TYPES
+        )
+
+    def get_variant(self, encoding):
+        # Returns the content compressed with "encoding", or None if that
+        # isn't smaller. Each variant is computed only once.
+        if encoding not in self._variants:
+            if encoding == "br":
+                compressed = brotli.compress(self.content)
+            else:
+                compressed = gzip.compress(self.content, mtime=0)
+            if len(compressed) >= len(self.content):
+                compressed = None
+            self._variants[encoding] = compressed
+        return self._variants[encoding]
+
+
+class CachedStaticFilesHandler(StaticFilesHandler):
+    """
+    Like StaticFilesHandler, but keeps the files it serves in memory.
+
+    The result of looking up each path with the staticfiles finders, and
+    the file's contents, are kept for the lifetime of the process. The
+    responses have an ETag and the Cache-Control header specified by
+    SELENIUM_STATIC_CACHE_CONTROL, so the browser can cache them across
+    tests. If SELENIUM_COMPRESS_STATIC_FILES is set, text files are
+    compressed with gzip (or brotli, if the "brotli" package is installed
+    and the browser accepts it).
+    """
+
+    _files = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._lock:
+            cls._files.clear()
+
+    def _get_file(self, path):
+        normalized_path = posixpath.normpath(path).lstrip("/")
+        with self._lock:
+            if normalized_path in self._files:
+                return self._files[normalized_path]
+        absolute_path = finders.find(normalized_path)
+        static_file = None
+        if absolute_path:
+            with open(absolute_path, "rb") as f:
+                content = f.read()
+            content_type, encoding = mimetypes.guess_type(absolute_path)
+            if encoding:
+                content_type = ENCODED_TYPES.get(encoding, content_type)
+            content_type = content_type or "application/octet-stream"
+            if content_type.startswith("text/"):
+                content_type += "; charset=" + settings.DEFAULT_CHARSET
+            static_file = _StaticFile(content, content_type)
+        with self._lock:
+            return self._files.setdefault(normalized_path, static_file)
+
+    def _get_encoding(self, request, static_file):
+        if not getattr(settings, "SELENIUM_COMPRESS_STATIC_FILES", False):
+            return None
+        if not static_file.is_compressible():
+            return None
+        accepted = _accepted_encodings(request)
+        for encoding in ("br", "gzip"):
+            if encoding == "br" and brotli is None:
+                continue
+            if encoding in accepted:
+                with self._lock:
+                    if static_file.get_variant(encoding) is not None:
+                        return encoding
+        return None
+
+    def serve(self, request):
+        path = self.file_path(request.path)
+        static_file = self._get_file(path)
+        if static_file is None:
+            if path.endswith("/") or path == "":
+                raise Http404("Directory indexes are not allowed here.")
+            raise Http404("'%s' could not be found" % path)
+
+        encoding = self._get_encoding(request, static_file)
+        etag = static_file.etag + ("-" + encoding if encoding else "")
+        etag = '"{}"'.format(etag)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": getattr(
+                settings, "SELENIUM_STATIC_CACHE_CONTROL", "max-age=3600"
+            ),
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            response = HttpResponseNotModified()
+        else:
+            content = static_file.content
+            if encoding:
+                content = static_file.get_variant(encoding)
+                headers["Content-Encoding"] = encoding
+            response = HttpResponse(content, content_type=static_file.content_type)
+        for name, value in headers.items():
+            response[name] = value
+        return response
@@ -0,0 +1,207 @@
+"""
+Benchmarks of the overhead of django-selenium-clean itself.
+
+These run against the stand-in WebDriver endpoint of fakewebdriver.py, so
+they need neither a browser nor network access. For each operation they
+report the number of WebDriver round trips and the time it takes, given
+the artificial latency per round trip. Run them like this:
+
+    python -m tests.benchmarks [--latency SECONDS] [--startup-time SECONDS]
+                               [--iterations N] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import django
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.common.by import By
+
+from .fakewebdriver import FakeWebDriverServer
+
+
+def run_benchmark(server, name, function, iterations):
+    # Warm up, e.g. wait for the browser to start
+    function()
+    server.reset_counts()
+    start = time.perf_counter()
+    for i in range(iterations):
+        function()
+    duration = time.perf_counter() - start
+    return {
+        "name": name,
+        "round_trips": server.round_trips / iterations,
+        "milliseconds": duration * 1000 / iterations,
+        "commands": {
+            command: count / iterations for command, count in server.counts.items()
+        },
+    }
+
+
+def get_benchmarks(server):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    from django_selenium_clean import (
+        PageElement,
+        PageElements,
+        SeleniumTestCase,
+        SeleniumWrapper,
+    )
+
+    selenium = SeleniumWrapper.create()
+    selenium.live_server_url = "http://localhost"
+    PageElement.selenium = selenium
+    heading = PageElement(By.ID, "heading")
+    missing = PageElement(By.ID, "missing")
+    elements = [PageElement(By.ID, "element-{}".format(i)) for i in range(10)]
+    rows = PageElements(By.CSS_SELECTOR, "tr.row")
+    alice = User.objects.create(username="alice", password=make_password("secret"))
+
+    class BenchmarkTestCase(SeleniumTestCase):
+        def runTest(self):
+            pass
+
+    def attribute_access():
+        selenium.get("http://localhost/")
+        heading.is_displayed()
+        heading.text
+        heading.click()
+
+    def elements_one_by_one():
+        selenium.get("http://localhost/")
+        for element in elements:
+            element.is_displayed()
+            element.text
+
+    def elements_snapshot():
+        selenium.get("http://localhost/")
+        selenium.snapshot(*elements)
+
+    def rows_one_by_one():
+        [row.text for row in rows]
+
+    def rows_texts():
+        rows.texts()
+
+    def login():
+        selenium.login(username="alice", password="secret")
+
+    def force_login():
+        selenium.force_login(alice)
+
+    def login_logout():
+        selenium.force_login(alice)
+        selenium.logout()
+
+    def class_setup_and_teardown():
+        BenchmarkTestCase.setUpClass()
+        BenchmarkTestCase("runTest").selenium.title
+        BenchmarkTestCase.tearDownClass()
+        BenchmarkTestCase.doClassCleanups()
+
+    benchmarks = [
+        ("PageElement: get, is_displayed, text, click", attribute_access),
+        ("10 PageElements one by one: is_displayed, text", elements_one_by_one),
+        ("10 PageElements with snapshot()", elements_snapshot),
+        ("Text of 100 rows one by one", rows_one_by_one),
+        ("Text of 100 rows with PageElements.texts()", rows_texts),
+        ("PageElements.wait_until_count", lambda: rows.wait_until_count(100)),
+    ]
+    waits = [
+        ("wait_until_exists", lambda: heading.wait_until_exists()),
+        ("wait_until_not_exists", lambda: missing.wait_until_not_exists()),
+        ("wait_until_is_displayed", lambda: heading.wait_until_is_displayed()),
+        ("wait_until_not_displayed", lambda: missing.wait_until_not_displayed()),
+        ("wait_until_contains", lambda: heading.wait_until_contains("Text")),
+        ("wait_until_not_contains", lambda: heading.wait_until_not_contains("zz")),
+        ("wait_until_is_clickable", lambda: heading.wait_until_is_clickable()),
+    ]
+    for engine in ("polling", "observer"):
+        for name, function in waits:
+            benchmarks.append(
+                (
+                    "{} ({})".format(name, engine),
+                    override_settings(SELENIUM_WAIT_ENGINE=engine)(function),
+                )
+            )
+    benchmarks += [
+        ("login", login),
+        ("force_login", force_login),
+        ("force_login and logout", login_logout),
+        ("wait_until_n_windows", lambda: selenium.wait_until_n_windows(1)),
+        ("SeleniumTestCase class setup and teardown", class_setup_and_teardown),
+        (
+            "SeleniumTestCase class setup and teardown (reusing the browser)",
+            override_settings(SELENIUM_REUSE_BROWSER=True)(class_setup_and_teardown),
+        ),
+    ]
+    return benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="Artificial latency of each round trip, in seconds",
+    )
+    parser.add_argument(
+        "--startup-time",
+        type=float,
+        default=0.5,
+        help="Artificial time it takes to start a browser, in seconds",
+    )
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server = FakeWebDriverServer(
+        latency=args.latency, startup_time=args.startup_time
+    ).start()
+    os.environ["DJANGO_SETTINGS_MODULE"] = "tests.settings"
+    django.setup()
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    remote = {
+        "callable": webdriver.Remote,
+        "args": [],
+        "kwargs": {"command_executor": server.url, "options": ChromeOptions()},
+    }
+    try:
+        with override_settings(SELENIUM_WEBDRIVERS={"default": remote}):
+            results = [
+                run_benchmark(server, name, function, args.iterations)
+                for name, function in get_benchmarks(server)
+            ]
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+        server.stop()
+
+    sys.stdout.write(
+        "Latency per round trip: {:.1f} ms, browser startup time: {:.1f} ms\n\n".format(
+            args.latency * 1000, args.startup_time * 1000
+        )
+    )
+    sys.stdout.write("{:>11} {:>9}  {}\n".format("round trips", "ms", "operation"))
+    for result in results:
+        sys.stdout.write(
+            "{round_trips:11.1f} {milliseconds:9.1f}  {name}\n".format(**result)
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency": args.latency, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+A stand-in WebDriver endpoint for measuring django-selenium-clean itself.
+
+It speaks enough of the W3C WebDriver protocol for webdriver.Remote and
+django-selenium-clean to work, but there is no browser behind it: every
+locator finds an element, except those whose value contains "missing"
+(which find none) or "row" (which find "rows" elements), and scripts
+return canned results. Each request can be delayed by an artificial
+latency, and the creation of a session by an artificial browser startup
+time. Requests are counted per command, so that the
+number of round trips made by the library can be measured.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+
+class WebDriverError(Exception):
+    def __init__(self, status, error, message=""):
+        self.status = status
+        self.error = error
+        self.message = message
+
+
+class Session(object):
+    def __init__(self):
+        self.url = "about:blank"
+        self.windows = ["window-1"]
+        self.current_window = "window-1"
+        self.cookies = {}
+        self.elements = {}
+        self.element_ids = {}
+        self.window_rect = {"x": 0, "y": 0, "width": 1024, "height": 768}
+        self.cdp_commands = []
+
+
+class FakeWebDriverServer(object):
+    def __init__(
+        self, latency=0.0, startup_time=0.0, rows=100, host="localhost", port=0
+    ):
+        self.latency = latency
+        self.startup_time = startup_time
+        self.rows = rows
+        self.sessions = {}
+        self.counts = Counter()
+        self.connections = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(FakeWebDriverRequestHandler):
+            fake = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    @property
+    def round_trips(self):
+        return sum(self.counts.values())
+
+    def locate(self, session, using, value):
+        if "missing" in value:
+            return []
+        count = self.rows if "row" in value else 1
+        result = []
+        for i in range(count):
+            # Ids must survive being put in URLs, so they can't be the locator
+            key = (using, value, i)
+            element_id = session.element_ids.setdefault(key, uuid.uuid4().hex)
+            session.elements[element_id] = key
+            result.append({ELEMENT_KEY: element_id})
+        return result
+
+    def execute_script(self, session, script, args):
+        if "locators.map" in script:
+            # SNAPSHOT_JS
+            return [
+                (
+                    [True, "Text of {}".format(value), {name: None for name in args[1]}]
+                    if self.locate(session, using, value)
+                    else None
+                )
+                for using, value in args[0]
+            ]
+        if 'case "count"' in script:
+            # COLLECT_JS
+            (using, value), what, name = args
+            elements = self.locate(session, using, value)
+            if what == "count":
+                return len(elements)
+            if what == "text":
+                return ["Text of {}".format(value)] * len(elements)
+            return [None] * len(elements)
+        if "isDisplayed" in script:
+            # Selenium's is_displayed() atom
+            return True
+        return None
+
+    def execute_async_script(self, session, script, args):
+        if "MutationObserver" in script:
+            # OBSERVE_CONDITION_JS
+            (using, value), condition, negate, text = args[:4]
+            satisfied = bool(self.locate(session, using, value))
+            if satisfied and condition == "contains":
+                satisfied = text in "Text of {}".format(value)
+            return satisfied != negate
+        return None
+
+    def handle(self, method, path, body):
+        with self._lock:
+            command = re.sub(r"^/session/[^/]+", "/session/{id}", path)
+            command = re.sub(r"/element/[^/]+", "/element/{id}", command)
+            self.counts["{} {}".format(method, command)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == "POST" and path == "/session":
+            time.sleep(self.startup_time)
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = Session()
+            capabilities = {"browserName": "fake", "browserVersion": "1.0"}
+            return {"sessionId": session_id, "capabilities": capabilities}
+        match = re.match(r"^/session/([^/]+)(/.*)?$", path)
+        if not match or match.group(1) not in self.sessions:
+            raise WebDriverError(404, "invalid session id")
+        session_id, rest = match.group(1), match.group(2) or ""
+        session = self.sessions[session_id]
+        return self.handle_session_command(session_id, session, method, rest, body)
+
+    def handle_session_command(self, session_id, session, method, rest, body):
+        if rest == "":
+            del self.sessions[session_id]
+            return None
+        if rest == "/url":
+            if method == "POST":
+                session.url = body["url"]
+                session.elements.clear()
+                session.element_ids.clear()
+                return None
+            return session.url
+        if rest in ("/back", "/forward", "/refresh", "/timeouts"):
+            return None
+        if rest == "/title":
+            return "Fake page"
+        if rest == "/source":
+            return "<html><body></body></html>"
+        if rest == "/window/handles":
+            return session.windows
+        if rest == "/window":
+            if method == "GET":
+                return session.current_window
+            if method == "POST":
+                if body["handle"] not in session.windows:
+                    raise WebDriverError(404, "no such window")
+                session.current_window = body["handle"]
+                return None
+            session.windows.remove(session.current_window)
+            return session.windows
+        if rest == "/window/new":
+            handle = "window-{}".format(uuid.uuid4().hex[:8])
+            session.windows.append(handle)
+            return {"handle": handle, "type": "tab"}
+        if rest == "/window/rect":
+            if method == "POST":
+                session.window_rect.update(
+                    {k: v for k, v in body.items() if v is not None}
+                )
+            return session.window_rect
+        if rest == "/element" or rest == "/elements":
+            elements = self.locate(session, body["using"], body["value"])
+            if rest == "/elements":
+                return elements
+            if not elements:
+                raise WebDriverError(404, "no such element", body["value"])
+            return elements[0]
+        match = re.match(r"^/element/([^/]+)/(\w+)", rest)
+        if match:
+            element_id, action = match.groups()
+            if element_id not in session.elements:
+                raise WebDriverError(404, "stale element reference")
+            if action == "text":
+                return "Text of {}".format(session.elements[element_id][1])
+            if action in ("enabled", "displayed"):
+                return True
+            if action in ("selected",):
+                return False
+            if action == "name":
+                return "div"
+            return None
+        if rest == "/goog/cdp/execute":
+            session.cdp_commands.append((body["cmd"], body["params"]))
+            return {}
+        if rest == "/execute/sync":
+            return self.execute_script(session, body["script"], body["args"])
+        if rest == "/execute/async":
+            return self.execute_async_script(session, body["script"], body["args"])
+        if rest == "/cookie":
+            if method == "POST":
+                cookie = body["cookie"]
+                session.cookies[cookie["name"]] = cookie
+                return None
+            if method == "DELETE":
+                session.cookies.clear()
+                return None
+            return list(session.cookies.values())
+        match = re.match(r"^/cookie/(.+)$", rest)
+        if match:
+            name = match.group(1)
+            if method == "DELETE":
+                session.cookies.pop(name, None)
+                return None
+            if name not in session.cookies:
+                raise WebDriverError(404, "no such cookie")
+            return session.cookies[name]
+        raise WebDriverError(404, "unknown command", "{} {}".format(method, rest))
+
+
+class FakeWebDriverRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super(FakeWebDriverRequestHandler, self).setup()
+        with self.fake._lock:
+            self.fake.connections += 1
+
+    def _handle(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") if length else None
+        try:
+            status, value = 200, self.fake.handle(method, self.path, body)
+        except WebDriverError as e:
+            status = e.status
+            value = {"error": e.error, "message": e.message, "stacktrace": ""}
+        data = json.dumps({"value": value}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
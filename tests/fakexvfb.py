@@ -0,0 +1,16 @@
+"""
+A stand-in for Xvfb, for testing the display pool where there is no X.
+
+Like Xvfb, it writes a display number to the file descriptor given with
+-displayfd, and then runs until it is terminated.
+"""
+
+import os
+import sys
+import time
+
+fd = int(sys.argv[sys.argv.index("-displayfd") + 1])
+os.write(fd, "{}\n".format(os.getpid()).encode())
+os.close(fd)
+while True:
+    time.sleep(60)
@@ -4,6 +4,8 @@ from tempfile import NamedTemporaryFile
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 
+from django_selenium_clean.nobrowser import NoBrowserDriver
+
 DEBUG = False
 
 ROOT_URLCONF = "tests.urls"
@@ -28,6 +30,8 @@ DATABASES = {
 
 STATIC_URL = "/static/"
 
+STATICFILES_DIRS = [os.path.join(os.path.dirname(__file__), "static")]
+
 INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.auth",
@@ -49,7 +53,7 @@ headless.add_argument("--headless")
 
 SELENIUM_WEBDRIVERS = {
     "default": {
-        "callable": webdriver.__dict__[os.environ.get("SELENIUM_BROWSER", "Chrome")],
+        "callable": getattr(webdriver, os.environ.get("SELENIUM_BROWSER", "Chrome")),
         "args": [],
         "kwargs": {},
     },
@@ -58,4 +62,9 @@ SELENIUM_WEBDRIVERS = {
         "args": [],
         "kwargs": {"options": headless},
     },
+    "nobrowser": {
+        "callable": NoBrowserDriver,
+        "args": [],
+        "kwargs": {},
+    },
 }
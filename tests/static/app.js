@@ -0,0 +1,42 @@
+// Served by the live server in the tests of CachedStaticFilesHandler
+var greetings = ["Greetings to earth", "Hello, world!"];
+greetings.push("Greeting number 0");
+greetings.push("Greeting number 1");
+greetings.push("Greeting number 2");
+greetings.push("Greeting number 3");
+greetings.push("Greeting number 4");
+greetings.push("Greeting number 5");
+greetings.push("Greeting number 6");
+greetings.push("Greeting number 7");
+greetings.push("Greeting number 8");
+greetings.push("Greeting number 9");
+greetings.push("Greeting number 10");
+greetings.push("Greeting number 11");
+greetings.push("Greeting number 12");
+greetings.push("Greeting number 13");
+greetings.push("Greeting number 14");
+greetings.push("Greeting number 15");
+greetings.push("Greeting number 16");
+greetings.push("Greeting number 17");
+greetings.push("Greeting number 18");
+greetings.push("Greeting number 19");
+greetings.push("Greeting number 20");
+greetings.push("Greeting number 21");
+greetings.push("Greeting number 22");
+greetings.push("Greeting number 23");
+greetings.push("Greeting number 24");
+greetings.push("Greeting number 25");
+greetings.push("Greeting number 26");
+greetings.push("Greeting number 27");
+greetings.push("Greeting number 28");
+greetings.push("Greeting number 29");
+greetings.push("Greeting number 30");
+greetings.push("Greeting number 31");
+greetings.push("Greeting number 32");
+greetings.push("Greeting number 33");
+greetings.push("Greeting number 34");
+greetings.push("Greeting number 35");
+greetings.push("Greeting number 36");
+greetings.push("Greeting number 37");
+greetings.push("Greeting number 38");
+greetings.push("Greeting number 39");
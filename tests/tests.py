@@ -1,14 +1,54 @@
+import gzip
+import io
+import json
 import os
-from unittest import SkipTest
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import SkipTest, mock
 
 import django
+from django.conf import settings
 from django.core import management
-from django.test import TestCase, override_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
 
-from selenium.common.exceptions import TimeoutException
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 
-from django_selenium_clean import PageElement, SeleniumTestCase
+from django_selenium_clean import (
+    PageElement,
+    PageElements,
+    SeleniumTestCase,
+    SeleniumWrapper,
+    WaitPolicy,
+    artifacts,
+    displays,
+    get_worker_id,
+    instrumentation,
+    sequential_widths,
+)
+from django_selenium_clean.durations import Durations
+from django_selenium_clean.nobrowser import NoBrowserDriver
+from django_selenium_clean.remote import SessionBroker
+from django_selenium_clean.runner import (
+    SeleniumTestRunner,
+    get_max_test_processes,
+    schedule,
+)
+
+from .fakewebdriver import FakeWebDriverServer
 
 
 class DjangoSeleniumCleanTestCase(SeleniumTestCase):
@@ -22,6 +62,9 @@ class DjangoSeleniumCleanTestCase(SeleniumTestCase):
     button_toggle_message = PageElement(By.ID, "toggle-message")
     togglable = PageElement(By.ID, "togglable")
     message = PageElement(By.ID, "message")
+    button_fetch_slow = PageElement(By.ID, "fetch-slow")
+    buttons = PageElements(By.TAG_NAME, "button")
+    togglables = PageElements(By.ID, "togglable")
 
     def test_toggle(self):
         self.selenium.get(self.live_server_url)
@@ -42,6 +85,7 @@ class DjangoSeleniumCleanTestCase(SeleniumTestCase):
         self.assertTrue(self.heading_earth.is_displayed())
         self.assertFalse(self.heading_world.is_displayed())
 
+    @sequential_widths
     def test_login(self):
         from django.contrib.auth.hashers import make_password
         from django.contrib.auth.models import User
@@ -204,6 +248,986 @@ class DjangoSeleniumCleanTestCase(SeleniumTestCase):
         self.assertTrue("world" in self.message.text)
         self.assertFalse("earth" in self.message.text)
 
+    def test_element_cache(self):
+        self.selenium.get(self.live_server_url)
+        info = self.selenium.element_cache_info()
+
+        # The second access reuses the element found by the first
+        self.heading_earth.is_displayed()
+        self.heading_earth.text
+        new_info = self.selenium.element_cache_info()
+        self.assertEqual(new_info.misses, info.misses + 1)
+        self.assertEqual(new_info.hits, info.hits + 1)
+
+        # Create element with id=togglable, access it, then replace it with
+        # another one; the cached element is then stale and is re-located.
+        self.button_toggle_element.click()
+        self.assertEqual(self.togglable.text, "Now you see me...")
+        self.button_toggle_element.click()
+        self.button_toggle_element.click()
+        self.togglable.wait_until_exists()
+        self.assertEqual(self.togglable.text, "Now you see me...")
+        self.assertEqual(self.selenium.element_cache_info().stale, info.stale + 1)
+
+        # Navigating clears the cache
+        self.selenium.get(self.live_server_url)
+        misses = self.selenium.element_cache_info().misses
+        self.heading_earth.text
+        self.assertEqual(self.selenium.element_cache_info().misses, misses + 1)
+
+    def test_snapshot(self):
+        self.selenium.get(self.live_server_url)
+        snapshot = self.selenium.snapshot(
+            self.heading_earth,
+            self.heading_world,
+            self.togglable,
+            (By.CSS_SELECTOR, "#message"),
+            attributes=["id"],
+        )
+        self.assertEqual(
+            snapshot[self.heading_earth],
+            (True, True, "Greetings to earth", {"id": "earth"}),
+        )
+        self.assertEqual(
+            snapshot[self.heading_world], (True, False, "", {"id": "world"})
+        )
+        self.assertFalse(snapshot[self.togglable].exists)
+        self.assertEqual(
+            snapshot[(By.CSS_SELECTOR, "#message")].text, "Greetings to earth"
+        )
+
+    def test_wait_until_server_idle(self):
+        self.selenium.get(self.live_server_url)
+        self.button_fetch_slow.click()
+        self.selenium.wait_until_server_idle()
+        self.message.wait_until_contains("Done slowly", timeout=0.5)
+
+        # The click only starts the request, so wait until the server gets it
+        requests = self._server_activity.requests
+        self.button_fetch_slow.click()
+        WaitPolicy(backoff=1).poll(
+            lambda: self._server_activity.requests > requests, timeout=2
+        )
+        with self.assertRaises(TimeoutException):
+            self.selenium.wait_until_server_idle(timeout=0.2)
+
+    async def test_aio(self):
+        await self.selenium.aio.get(self.live_server_url)
+        await self.button_toggle_heading.aio.click()
+        await self.heading_world.aio.wait_until_is_displayed()
+        self.assertEqual(await self.heading_world.aio.text, "Hello, world!")
+        with self.assertRaises(TimeoutException):
+            await self.heading_earth.aio.wait_until_is_displayed(timeout=0.5)
+        self.assertEqual(len(await self.buttons.aio.texts()), 5)
+
+    def test_run_concurrently(self):
+        other_selenium = self.get_selenium("other")
+        self.assertIs(self.get_selenium("other"), other_selenium)
+        self.assertIsNot(other_selenium, self.selenium)
+
+        def toggle_message(selenium, times):
+            selenium.get(self.live_server_url)
+            for i in range(times):
+                self.button_toggle_message.click()
+            return self.message.text
+
+        self.assertEqual(
+            self.run_concurrently(
+                (self.selenium, lambda selenium: toggle_message(selenium, 1)),
+                (other_selenium, lambda selenium: toggle_message(selenium, 2)),
+            ),
+            ["Hello, world!", "Greetings to earth"],
+        )
+        self.assertEqual(self.message.text, "Hello, world!")
+        self.assertEqual(self.message.bind(other_selenium).text, "Greetings to earth")
+
+    def test_page_elements(self):
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(len(self.buttons), 5)
+        self.assertEqual(self.buttons[0].get_attribute("id"), "toggle-heading")
+        self.assertEqual(
+            self.buttons.attributes("id"),
+            [
+                "toggle-heading",
+                "open-window",
+                "toggle-element",
+                "toggle-message",
+                "fetch-slow",
+            ],
+        )
+        self.assertEqual(self.buttons.texts(), [button.text for button in self.buttons])
+
+        self.assertEqual(len(self.togglables), 0)
+        self.button_toggle_element.click()
+        self.togglables.wait_until_count(1)
+        self.button_toggle_element.click()
+        self.togglables.wait_until_count_changes(1)
+        self.assertEqual(self.togglables.texts(), [])
+        with self.assertRaises(TimeoutException):
+            self.togglables.wait_until_count(1, timeout=1)
+
+
+@override_settings(SELENIUM_WAIT_ENGINE="observer")
+class ObserverWaitTestCase(DjangoSeleniumCleanTestCase):
+    """Runs all the above tests with the MutationObserver wait engine."""
+
+
+class NoBrowserTestCase(SeleniumTestCase):
+    selenium_webdriver = "nobrowser"
+
+    heading_earth = PageElement(By.ID, "earth")
+    heading_world = PageElement(By.ID, "world")
+    user_info = PageElement(By.ID, "user")
+    buttons = PageElements(By.TAG_NAME, "button")
+    name = PageElement(By.ID, "name")
+    loud = PageElement(By.CSS_SELECTOR, "label > input")
+    mars = PageElement(By.CSS_SELECTOR, "#planet option[value=mars]")
+    comment = PageElement(By.ID, "comment")
+    submit = PageElement(By.ID, "submit")
+    result = PageElements(By.CSS_SELECTOR, "#result li")
+    home = PageElement(By.LINK_TEXT, "Home")
+
+    def test_page(self):
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(self.selenium.title, "Greetings to the world")
+        self.assertTrue(self.heading_earth.is_displayed())
+        self.assertFalse(self.heading_world.is_displayed())
+        self.heading_earth.wait_until_contains("earth")
+        self.assertEqual(self.buttons.count(), 5)
+        state = self.selenium.snapshot(self.heading_earth, self.heading_world)
+        self.assertEqual(state[self.heading_earth].text, "Greetings to earth")
+        self.assertFalse(state[self.heading_world].displayed)
+
+    @sequential_widths
+    def test_login(self):
+        from django.contrib.auth.models import User
+
+        alice = User.objects.create(username="alice", is_active=True)
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(self.user_info.text, "No user is logged on.")
+        self.selenium.force_login(alice)
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(self.user_info.text, "The logged on user is alice.")
+        self.selenium.logout()
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(self.user_info.text, "No user is logged on.")
+
+    def test_form(self):
+        self.selenium.get(self.live_server_url + "/form/")
+        self.name.send_keys("Alice")
+        self.loud.click()
+        self.mars.click()
+        self.comment.send_keys("Hi")
+        self.submit.click()
+        self.assertEqual(
+            self.result.texts(),
+            ["comment=Hi", "kind=greeting", "loud=on", "name=Alice", "planet=mars"],
+        )
+        self.home.click()
+        self.heading_earth.wait_until_is_displayed()
+
+    async def test_aio(self):
+        url = await self.selenium.aio.live_server_url
+        self.assertEqual(url, self.live_server_url)
+        await self.selenium.aio.get(url)
+        self.assertEqual(await self.selenium.aio.title, "Greetings to the world")
+        self.assertEqual(await self.heading_earth.aio.text, "Greetings to earth")
+        await self.heading_earth.aio.wait_until_contains("earth")
+        self.assertEqual(await self.buttons.aio.count(), 5)
+
+        # Finding the element is done in the executor, like calling its method
+        threads = []
+        find_cached_element = SeleniumWrapper.find_cached_element
+
+        def spy(selenium, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return find_cached_element(selenium, *args, **kwargs)
+
+        with mock.patch.object(SeleniumWrapper, "find_cached_element", spy):
+            self.assertEqual(await self.heading_earth.aio.get_attribute("id"), "earth")
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+class LoginSessionsTestCase(SeleniumTestCase):
+    selenium_webdriver = "nobrowser"
+
+    user_info = PageElement(By.ID, "user")
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        self.alice = User.objects.create_user("alice", password="secret")
+        self.selenium.get(self.live_server_url)
+
+    def get_session_key(self, selenium):
+        return selenium.get_cookie(settings.SESSION_COOKIE_NAME)["value"]
+
+    def test_login(self):
+        from django.contrib import auth
+
+        with mock.patch.object(
+            auth, "authenticate", wraps=auth.authenticate
+        ) as authenticate:
+            self.assertTrue(self.selenium.login(username="alice", password="secret"))
+            session_key = self.get_session_key(self.selenium)
+            self.assertTrue(self.selenium.login(username="alice", password="secret"))
+            self.assertEqual(authenticate.call_count, 1)
+            self.assertEqual(self.get_session_key(self.selenium), session_key)
+            self.selenium.get(self.live_server_url)
+            self.assertEqual(self.user_info.text, "The logged on user is alice.")
+
+            # A changed password invalidates the cached credentials
+            self.alice.set_password("changed")
+            self.alice.save()
+            self.assertFalse(self.selenium.login(username="alice", password="secret"))
+            self.assertEqual(authenticate.call_count, 2)
+
+    def test_logout(self):
+        self.selenium.force_login(self.alice)
+        session_key = self.get_session_key(self.selenium)
+        self.selenium.logout()
+        self.selenium.force_login(self.alice)
+        self.assertNotEqual(self.get_session_key(self.selenium), session_key)
+
+    def test_create_sessions(self):
+        from django.contrib.auth.models import User
+
+        bob = User.objects.create_user("bob")
+        sessions = self.selenium.create_sessions([self.alice, bob])
+        self.assertEqual(set(sessions), {self.alice, bob})
+        self.selenium.force_login(bob)
+        self.assertEqual(self.get_session_key(self.selenium), sessions[bob])
+        self.selenium.get(self.live_server_url)
+        self.assertEqual(self.user_info.text, "The logged on user is bob.")
+
+    def test_sessions_not_shared(self):
+        other = self.get_selenium("other")
+        other.get(self.live_server_url)
+        self.selenium.force_login(self.alice)
+        other.force_login(self.alice)
+        self.assertNotEqual(
+            self.get_session_key(self.selenium), self.get_session_key(other)
+        )
+
+        # Logging out one browser doesn't log out the other
+        self.selenium.logout()
+        other.get(self.live_server_url)
+        self.assertEqual(
+            self.user_info.bind(other).text, "The logged on user is alice."
+        )
+
+
+class ArtifactsTestCase(SeleniumTestCase):
+    selenium_webdriver = "nobrowser"
+
+    def test_artifacts(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        writer = artifacts.ArtifactWriter(directory, max_bytes=10**6, queue_size=1)
+        self.addCleanup(writer.close)
+        self.selenium.get(self.live_server_url)
+        captured = artifacts.capture(self._get_browsers_to_capture())
+        writer.submit("test_1", captured)
+        writer.flush()
+        with open(os.path.join(directory, "index.jsonl")) as f:
+            record = json.loads(f.read())
+        self.assertEqual(record["urls"], {"": self.live_server_url})
+        self.assertEqual(record["files"], ["dom.html.gz"])
+        path = os.path.join(directory, record["directory"], "dom.html.gz")
+        with gzip.open(path) as f:
+            self.assertIn(b"Greetings to earth", f.read())
+
+        # Artifacts that don't fit in the budget are dropped
+        writer.max_bytes = record["bytes"] * 3 // 2
+        writer.submit("test_2", captured)
+        writer.flush()
+        with open(os.path.join(directory, "index.jsonl")) as f:
+            record = json.loads(f.readlines()[1])
+        self.assertEqual(record["test"], "test_2")
+        self.assertIn("dropped", record)
+
+
+@override_settings(SELENIUM_DATABASE_SNAPSHOTS=True)
+@sequential_widths
+class DatabaseSnapshotTestCase(SeleniumTestCase):
+    """Each test must find the database as the previous one found it."""
+
+    def _create_user(self):
+        from django.contrib.auth.models import User
+
+        self.assertFalse(User.objects.exists())
+        User.objects.create(username="alice")
+        self.assertEqual(
+            self.__class__.__dict__["_database_snapshots"].keys(), {"default"}
+        )
+
+    def test_1(self):
+        self._create_user()
+
+    def test_2(self):
+        self._create_user()
+
+
+class ResetSequencesTestCase(SeleniumTestCase):
+    selenium_webdriver = "nobrowser"
+    reset_sequences = True
+
+    def create_user(self):
+        from django.contrib.auth.models import User
+
+        self.assertEqual(User.objects.create(username="alice").pk, 1)
+
+    def test_1(self):
+        self.create_user()
+
+    def test_2(self):
+        self.create_user()
+
+
+class WaitPolicyTestCase(TestCase):
+    def test_backoff(self):
+        policy = WaitPolicy(poll_interval=0.1, backoff=2, max_poll_interval=0.5)
+        values = iter([False, False, None, False, False, "found"])
+        with mock.patch("time.sleep") as sleep:
+            self.assertEqual(policy.poll(lambda: next(values), 10), "found")
+        intervals = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(intervals, [0.1, 0.2, 0.4, 0.5, 0.5])
+
+    def test_negate(self):
+        def condition():
+            raise NoSuchElementException()
+
+        policy = WaitPolicy()
+        self.assertFalse(policy.poll(condition, 1, negate=True))
+
+    def test_timeout(self):
+        policy = WaitPolicy(poll_interval=0.1)
+        start = time.monotonic()
+        with self.assertRaises(TimeoutException):
+            policy.poll(lambda: False, 0.25)
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    @override_settings(
+        SELENIUM_WAIT_POLICY={"default_timeout": 5, "timeout_multiplier": 3}
+    )
+    def test_timeout_multiplier(self):
+        policy = WaitPolicy.from_settings()
+        self.assertEqual(policy.get_timeout(), 15)
+        self.assertEqual(policy.get_timeout(0.5), 1.5)
+
+    def test_wait_until_n_windows(self):
+        selenium = SeleniumWrapper.create("nobrowser")
+        self.addCleanup(selenium.quit)
+        selenium.wait_until_n_windows(1, timeout=0.3)
+        start = time.monotonic()
+        with self.assertRaises(AssertionError):
+            selenium.wait_until_n_windows(2, timeout=0.3)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+
+
+class CachedStaticFilesHandlerTestCase(TestCase):
+    def setUp(self):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        from django_selenium_clean.static import CachedStaticFilesHandler
+
+        CachedStaticFilesHandler.clear_cache()
+        self.handler = CachedStaticFilesHandler(WSGIHandler())
+        self.factory = RequestFactory()
+
+    def test_etag(self):
+        response = self.handler.serve(self.factory.get("/static/app.js"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Greetings to earth", response.content)
+        self.assertEqual(response["Cache-Control"], "max-age=3600")
+        request = self.factory.get(
+            "/static/app.js", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(self.handler.serve(request).status_code, 304)
+
+    def test_not_found(self):
+        with self.assertRaises(Http404):
+            self.handler.serve(self.factory.get("/static/nonexistent.js"))
+
+    @override_settings(SELENIUM_COMPRESS_STATIC_FILES=True)
+    def test_gzip(self):
+        uncompressed = self.handler.serve(self.factory.get("/static/app.js"))
+        request = self.factory.get("/static/app.js", HTTP_ACCEPT_ENCODING="gzip")
+        response = self.handler.serve(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertNotEqual(response["ETag"], uncompressed["ETag"])
+        self.assertEqual(gzip.decompress(response.content), uncompressed.content)
+
+
+class CloneProfileTestCase(TestCase):
+    def test_clone_profile(self):
+        from django_selenium_clean.profiles import clone_profile
+
+        template = tempfile.mkdtemp()
+        destination = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, template)
+        self.addCleanup(shutil.rmtree, destination)
+        os.mkdir(os.path.join(template, "Default"))
+        with open(os.path.join(template, "Default", "Preferences"), "w") as f:
+            f.write("{}")
+        with open(os.path.join(template, "lock"), "w") as f:
+            f.write("")
+
+        clone_profile(template, destination)
+        with open(os.path.join(destination, "Default", "Preferences")) as f:
+            self.assertEqual(f.read(), "{}")
+        self.assertFalse(os.path.exists(os.path.join(destination, "lock")))
+
+        # The clone is independent of the template
+        with open(os.path.join(destination, "Default", "Preferences"), "w") as f:
+            f.write("changed")
+        with open(os.path.join(template, "Default", "Preferences")) as f:
+            self.assertEqual(f.read(), "{}")
+
+
+class ProfileRecordingBrowser(object):
+    # Records the arguments each browser is started with
+    started = []
+    capabilities = {"browserName": "fake"}
+
+    def __init__(self, options):
+        self.started.append(options.arguments)
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+
+def start_browser_that_crashes(options):
+    raise WebDriverException("The browser crashed")
+
+
+@override_settings(SELENIUM_BACKGROUND_START=False)
+class ProfileDirTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(ProfileRecordingBrowser.started.clear)
+        self.options = ChromeOptions()
+        self.entry = {
+            "callable": ProfileRecordingBrowser,
+            "args": [],
+            "kwargs": {"options": self.options},
+            "profile_dir_arguments": ["--user-data-dir={}"],
+        }
+
+    def test_worker_id(self):
+        self.assertEqual(get_worker_id(), 0)
+        with mock.patch("django.test.runner._worker_id", 3):
+            self.assertEqual(get_worker_id(), 3)
+
+    def test_profile_dir(self):
+        with override_settings(SELENIUM_WEBDRIVERS={"profile": self.entry}):
+            selenium = SeleniumWrapper.create("profile")
+        profile_dir = selenium._profile_dir
+        self.assertTrue(os.path.isdir(profile_dir))
+        self.assertTrue(os.path.basename(profile_dir).startswith("selenium-worker0-"))
+        self.assertEqual(
+            ProfileRecordingBrowser.started, [["--user-data-dir=" + profile_dir]]
+        )
+        # The options of the entry are left as they were
+        self.assertEqual(self.options.arguments, [])
+
+        selenium.quit()
+        self.assertFalse(os.path.exists(profile_dir))
+
+    def test_profile_dir_of_worker(self):
+        with override_settings(SELENIUM_WEBDRIVERS={"profile": self.entry}), mock.patch(
+            "django.test.runner._worker_id", 2
+        ):
+            selenium = SeleniumWrapper.create("profile")
+        self.addCleanup(selenium.quit)
+        self.assertTrue(
+            os.path.basename(selenium._profile_dir).startswith("selenium-worker2-")
+        )
+
+    def test_start_failure(self):
+        # The profile directory is removed if the browser can't be started
+        self.entry["callable"] = start_browser_that_crashes
+        profile_dirs = []
+        real_mkdtemp = tempfile.mkdtemp
+
+        def mkdtemp(**kwargs):
+            profile_dirs.append(real_mkdtemp(**kwargs))
+            return profile_dirs[-1]
+
+        with override_settings(SELENIUM_WEBDRIVERS={"profile": self.entry}), mock.patch(
+            "tempfile.mkdtemp", mkdtemp
+        ):
+            with self.assertRaises(WebDriverException):
+                SeleniumWrapper.create("profile")
+        [profile_dir] = profile_dirs
+        self.assertFalse(os.path.exists(profile_dir))
+
+
+class SeleniumTestRunnerTestCase(TestCase):
+    def test_parallel(self):
+        self.assertEqual(SeleniumTestRunner().parallel, 0)
+        with override_settings(SELENIUM_PARALLEL=3):
+            self.assertEqual(SeleniumTestRunner().parallel, 3)
+            # --parallel in the command line takes precedence
+            self.assertEqual(SeleniumTestRunner(parallel=2).parallel, 2)
+        with override_settings(SELENIUM_PARALLEL="auto"):
+            self.assertEqual(SeleniumTestRunner().parallel, get_max_test_processes())
+
+
+class ManagedRemoteTestCase(TestCase):
+    def test_session_reuse(self):
+        server = FakeWebDriverServer().start()
+        self.addCleanup(server.stop)
+        fd, broker_file = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, broker_file)
+        entry = {
+            "callable": webdriver.Remote,
+            "args": [],
+            "kwargs": {"command_executor": server.url, "options": ChromeOptions()},
+            "remote": {"reuse_sessions": True},
+        }
+        with override_settings(
+            SELENIUM_WEBDRIVERS={"grid": entry},
+            SELENIUM_SESSION_BROKER_FILE=broker_file,
+        ):
+            selenium = SeleniumWrapper.create("grid")
+            session_id = selenium.session_id
+            selenium.title
+            selenium.title
+            self.assertEqual(server.connections, 1)
+
+            # The session is parked rather than ended, and reused
+            selenium.quit()
+            self.assertIn(session_id, server.sessions)
+            selenium = SeleniumWrapper.create("grid")
+            self.assertEqual(selenium.session_id, session_id)
+            self.assertEqual(server.counts["POST /session"], 1)
+
+            selenium.quit()
+            SessionBroker(broker_file).end_all()
+        self.assertEqual(server.sessions, {})
+
+    def test_shared_connection(self):
+        server = FakeWebDriverServer().start()
+        self.addCleanup(server.stop)
+        entry = {
+            "callable": webdriver.Remote,
+            "args": [],
+            "kwargs": {"command_executor": server.url, "options": ChromeOptions()},
+            "remote": True,
+        }
+        with override_settings(
+            SELENIUM_WEBDRIVERS={"grid": entry}, SELENIUM_BACKGROUND_START=False
+        ):
+            first = SeleniumWrapper.create("grid")
+            second = SeleniumWrapper.create("grid")
+        self.addCleanup(second.quit)
+        first.title
+        second.title
+        self.assertEqual(server.connections, 1)
+
+        # Quitting one of the browsers doesn't close the connections of the
+        # other
+        first.quit()
+        second.title
+        second.title
+        self.assertEqual(server.connections, 1)
+
+
+class BlockedUrlsTestCase(TestCase):
+    def test_remote(self):
+        server = FakeWebDriverServer().start()
+        self.addCleanup(server.stop)
+        entry = {
+            "callable": webdriver.Remote,
+            "args": [],
+            "kwargs": {"command_executor": server.url, "options": ChromeOptions()},
+            "blocked_urls": ["*.woff2"],
+        }
+        with override_settings(SELENIUM_WEBDRIVERS={"fake": entry}):
+            selenium = SeleniumWrapper.create("fake")
+            self.addCleanup(selenium.quit)
+            session = server.sessions[selenium.session_id]
+        self.assertEqual(
+            session.cdp_commands,
+            [("Network.enable", {}), ("Network.setBlockedURLs", {"urls": ["*.woff2"]})],
+        )
+
+    def test_unsupported(self):
+        entry = {
+            "callable": NoBrowserDriver,
+            "args": [],
+            "kwargs": {},
+            "blocked_urls": ["*.woff2"],
+        }
+        with override_settings(
+            SELENIUM_WEBDRIVERS={"nobrowser": entry}, SELENIUM_BACKGROUND_START=False
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                SeleniumWrapper.create("nobrowser")
+
+
+class ReuseBrowserTestCase(TestCase):
+    def setUp(self):
+        self.server = FakeWebDriverServer().start()
+        self.addCleanup(self.server.stop)
+        entry = {
+            "callable": webdriver.Remote,
+            "args": [],
+            "kwargs": {
+                "command_executor": self.server.url,
+                "options": ChromeOptions(),
+            },
+        }
+        settings_override = override_settings(
+            SELENIUM_WEBDRIVERS={"fake": entry}, SELENIUM_REUSE_BROWSER=True
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_reset(self):
+        selenium = SeleniumWrapper("fake")
+        self.addCleanup(selenium._discard_driver)
+        selenium.get("http://localhost/page/")
+        selenium.add_cookie({"name": "sessionid", "value": "abc"})
+        selenium.switch_to.new_window("tab")
+        self.assertEqual(len(selenium.window_handles), 2)
+
+        selenium.reset()
+        self.assertEqual(len(selenium.window_handles), 1)
+        self.assertEqual(selenium.get_cookies(), [])
+        self.assertEqual(selenium.current_url, "about:blank")
+
+    def test_reuse(self):
+        selenium = SeleniumWrapper("fake")
+        self.addCleanup(selenium._discard_driver)
+        session_id = selenium.session_id
+        self.assertEqual(SeleniumWrapper("fake").session_id, session_id)
+        self.assertEqual(self.server.counts["POST /session"], 1)
+
+    def test_dead_browser_is_replaced(self):
+        selenium = SeleniumWrapper("fake")
+        self.addCleanup(selenium._discard_driver)
+        session_id = selenium.session_id
+        del self.server.sessions[session_id]
+        self.assertFalse(selenium.is_alive())
+
+        selenium = SeleniumWrapper("fake")
+        self.assertNotEqual(selenium.session_id, session_id)
+        self.assertEqual(self.server.counts["POST /session"], 2)
+        self.assertTrue(selenium.is_alive())
+
+
+class VirtualDisplayTestCase(TestCase):
+    @override_settings(SELENIUM_WIDTHS=[800, 1200])
+    def test_pool(self):
+        fake_xvfb = os.path.join(os.path.dirname(__file__), "fakexvfb.py")
+        pool = displays.DisplayPool([sys.executable, fake_xvfb])
+        self.addCleanup(pool.stop_all)
+        size = displays.get_size()
+        self.assertEqual(size, (1200, 1024))
+        first = pool.acquire(size)
+        second = pool.acquire(size)
+        self.assertNotEqual(first.name, second.name)
+        self.assertIn("1200x1024x24", first.process.args)
+
+        # A released display is reused rather than another one started
+        pool.release(first)
+        self.assertIs(pool.acquire(size), first)
+
+        kwargs = displays.with_display(
+            webdriver.Chrome, {"options": ChromeOptions()}, first
+        )
+        self.assertEqual(kwargs["service"].env["DISPLAY"], first.name)
+
+        pool.stop_all()
+        self.assertFalse(first.is_running())
+        self.assertFalse(second.is_running())
+
+    def test_template_profile(self):
+        # The browser that creates the template profile also uses a display
+        fake_xvfb = os.path.join(os.path.dirname(__file__), "fakexvfb.py")
+        pool = displays.DisplayPool([sys.executable, fake_xvfb])
+        self.addCleanup(pool.stop_all)
+        entry = {
+            "callable": DisplayRecordingBrowser,
+            "args": [],
+            "kwargs": {"options": ChromeOptions(), "service": ChromeService()},
+            "profile_dir_arguments": ["--user-data-dir={}"],
+            "template_profile": True,
+            "virtual_display": True,
+        }
+        with override_settings(
+            SELENIUM_WEBDRIVERS={"display": entry}, SELENIUM_BACKGROUND_START=False
+        ), mock.patch.object(displays, "pool", pool):
+            selenium = SeleniumWrapper.create("display")
+            self.addCleanup(selenium.quit)
+            self.addCleanup(DisplayRecordingBrowser.started.clear)
+
+        # The template's browser released its display for the other one
+        [template, browser] = DisplayRecordingBrowser.started
+        self.assertEqual(template[0], selenium._display.name)
+        self.assertEqual(browser[0], selenium._display.name)
+        self.assertNotEqual(template[1], browser[1])
+        self.assertEqual(len(pool._all), 1)
+
+
+class DisplayRecordingBrowser(object):
+    # Records the display and the arguments each browser is started with
+    started = []
+    capabilities = {"browserName": "fake"}
+
+    def __init__(self, options, service):
+        self.started.append((service.env.get("DISPLAY"), options.arguments))
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+
+def start_broken_browser():
+    raise WebDriverException("The browser could not be started")
+
+
+class BrowserStartFailureTestCase(TestCase):
+    def test_error_of_test_case(self):
+        class BrokenBrowserTestCase(SeleniumTestCase):
+            selenium_webdriver = "broken"
+            databases = set()
+
+            def test_nothing(self):
+                pass
+
+        entry = {"callable": start_broken_browser, "args": [], "kwargs": {}}
+        result = unittest.TestResult()
+        with override_settings(SELENIUM_WEBDRIVERS={"broken": entry}):
+            unittest.TestSuite([BrokenBrowserTestCase("test_nothing")]).run(result)
+
+        # It is reported as an error of setUpClass(), and the test doesn't run
+        self.assertEqual(result.testsRun, 0)
+        self.assertEqual(len(result.errors), 1)
+        test, traceback = result.errors[0]
+        self.assertIn("setUpClass", str(test))
+        self.assertIn("The browser could not be started", traceback)
+
+    def test_class_settings(self):
+        # The browser is started with the settings overridden for the class
+        @override_settings(
+            SELENIUM_WEBDRIVERS={
+                "mine": {"callable": NoBrowserDriver, "args": [], "kwargs": {}}
+            },
+            SELENIUM_BACKGROUND_START=False,
+        )
+        class OverriddenSettingsTestCase(SeleniumTestCase):
+            selenium_webdriver = "mine"
+            databases = set()
+
+            def test_browser(self):
+                self.assertIsInstance(self.selenium.driver, NoBrowserDriver)
+                self.assertIsNone(self.selenium._driver_future)
+
+        result = unittest.TestResult()
+        unittest.TestSuite([OverriddenSettingsTestCase("test_browser")]).run(result)
+        self.assertTrue(result.wasSuccessful(), result.errors + result.failures)
+        self.assertEqual(result.testsRun, 1)
+
+
+@override_settings(SELENIUM_WIDTHS=[800, 1200])
+class WidthsTestCase(TestCase):
+    def run_at_widths(self):
+        runs = []
+
+        class WidthTestCase(SeleniumTestCase):
+            selenium_webdriver = "nobrowser"
+            databases = set()
+
+            def test_width(self):
+                self.selenium.get(self.live_server_url)
+                width = self.selenium.get_window_size()["width"]
+                runs.append((self.id(), width))
+
+            async def test_async(self):
+                await self.selenium.aio.get(self.live_server_url)
+                runs.append((self.id(), None))
+
+        result = unittest.TestResult()
+        unittest.TestSuite(
+            [WidthTestCase("test_width"), WidthTestCase("test_async")]
+        ).run(result)
+        self.assertTrue(result.wasSuccessful(), result.errors + result.failures)
+        self.assertEqual(result.testsRun, 4)
+        prefix = "tests.tests.WidthsTestCase.run_at_widths.<locals>.WidthTestCase."
+        self.assertEqual(
+            sorted(runs),
+            [
+                (prefix + "test_async[width=1200]", None),
+                (prefix + "test_async[width=800]", None),
+                (prefix + "test_width[width=1200]", 1200),
+                (prefix + "test_width[width=800]", 800),
+            ],
+        )
+
+    def test_sequential(self):
+        self.run_at_widths()
+
+    @override_settings(SELENIUM_WIDTHS_CONCURRENT=True)
+    def test_concurrent(self):
+        self.run_at_widths()
+
+    @override_settings(SELENIUM_WIDTHS_CONCURRENT=True)
+    def test_concurrent_setup_errors(self):
+        # Errors of Django's setup and teardown are errors of the test, as
+        # when the widths run sequentially
+        class BrokenSetupTestCase(SeleniumTestCase):
+            selenium_webdriver = "nobrowser"
+            databases = set()
+            setups = 0
+
+            @classmethod
+            def _pre_setup(cls):
+                # The first one is done by setUpClass()
+                cls.setups += 1
+                if cls.setups > 1:
+                    raise RuntimeError("Setup failed")
+                super(BrokenSetupTestCase, cls)._pre_setup()
+
+            def test_1(self):
+                pass
+
+            def test_2(self):
+                pass
+
+        class BrokenTeardownTestCase(SeleniumTestCase):
+            selenium_webdriver = "nobrowser"
+            databases = set()
+
+            def _post_teardown(self):
+                super(BrokenTeardownTestCase, self)._post_teardown()
+                raise RuntimeError("Teardown failed")
+
+            def test_nothing(self):
+                pass
+
+        result = unittest.TestResult()
+        unittest.TestSuite(
+            [
+                BrokenSetupTestCase("test_1"),
+                BrokenSetupTestCase("test_2"),
+                BrokenTeardownTestCase("test_nothing"),
+            ]
+        ).run(result)
+        self.assertEqual(result.testsRun, 4)
+        self.assertEqual(result.failures, [])
+        errors = [traceback for test, traceback in result.errors]
+        self.assertEqual(len(errors), 2)
+        self.assertIn("Setup failed", errors[0])
+        self.assertIn("Teardown failed", errors[1])
+
+
+@override_settings(SELENIUM_INSTRUMENTATION=True)
+class InstrumentationTestCase(TestCase):
+    def test_recorder(self):
+        server = FakeWebDriverServer().start()
+        self.addCleanup(server.stop)
+        recorder = instrumentation.Recorder()
+        entry = {
+            "callable": webdriver.Remote,
+            "args": [],
+            "kwargs": {"command_executor": server.url, "options": ChromeOptions()},
+        }
+        heading = PageElement(By.ID, "heading")
+        missing = PageElement(By.ID, "missing")
+        # Until after the browser has quit
+        patcher = mock.patch.object(instrumentation, "recorder", recorder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with override_settings(SELENIUM_WEBDRIVERS={"fake": entry}):
+            selenium = SeleniumWrapper.create("fake")
+            self.addCleanup(selenium.quit)
+            selenium._wait_for_driver()
+            server.counts.clear()
+            with recorder.test("test_1"):
+                selenium.title
+                selenium.title
+                selenium.capabilities
+                selenium.switch_to
+                element = heading.bind(selenium)
+                element.text
+                element.click()
+                element.is_displayed()
+                with self.assertRaises(TimeoutException):
+                    missing.bind(selenium).wait_until_exists(timeout=0.2)
+        recorder._finalizer.cancel()
+
+        # Each request to the server is a command, including those of the
+        # element and of the wait
+        requests = sum(server.counts.values())
+        data = recorder.as_dict()
+        commands = data["commands"]
+        self.assertEqual(sum(c["count"] for c in commands.values()), requests)
+        self.assertEqual(commands["getTitle"]["count"], 2)
+        self.assertEqual(commands["getElementText"]["count"], 1)
+        self.assertEqual(commands["clickElement"]["count"], 1)
+        # The heading, and the missing element once for each check of the wait
+        finds = server.counts["POST /session/{id}/element"]
+        self.assertEqual(commands["findElement"]["count"], finds)
+        self.assertGreater(finds, 2)
+        self.assertEqual(data["lookups"]["id=heading"]["count"], 1)
+        [wait] = data["waits"]
+        self.assertEqual(wait["test"], "test_1")
+        self.assertEqual(wait["wait"], "exists: id=missing")
+        self.assertEqual((wait["timeout"], wait["timed_out"]), (0.2, 1))
+        test = data["tests"]["test_1"]
+        self.assertEqual(test["commands"], requests)
+        self.assertGreaterEqual(test["wait_time"], 0.2)
+
+        # The report
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        with override_settings(SELENIUM_INSTRUMENTATION_FILE=filename), mock.patch(
+            "sys.stderr", io.StringIO()
+        ) as stderr:
+            recorder.report()
+        self.assertIn("exists: id=missing in test_1", stderr.getvalue())
+        with open(filename) as f:
+            self.assertEqual(json.load(f)["commands"]["getTitle"]["count"], 2)
+
+
+class ScheduleTestCase(TestCase):
+    def test_longest_first(self):
+        jobs = [(1, None, "a"), (5, None, "b"), (3, None, "c"), (2, None, "d")]
+        self.assertEqual(schedule(jobs, 2), ["b", "c", "d", "a"])
+
+    def test_switch_cost(self):
+        jobs = [(3, "x", "x1"), (2.9, "y", "y1"), (2, "x", "x2"), (1.9, "y", "y2")]
+        self.assertEqual(schedule(jobs, 2), ["x1", "y1", "x2", "y2"])
+        # The worker that ran y1 is free first and continues with y2
+        self.assertEqual(schedule(jobs, 2, switch_cost=1), ["x1", "y1", "y2", "x2"])
+
+    def test_estimate(self):
+        durations = Durations(
+            {
+                "tests.tests.ScheduleTestCase": {
+                    "duration": 5,
+                    "overhead": 2,
+                    "tests": {"test_estimate": 1, "test_switch_cost": 2},
+                }
+            }
+        )
+        estimate = durations.estimate(
+            ScheduleTestCase, ["test_estimate", "test_longest_first"]
+        )
+        # The unmeasured test is assumed to take the average, 1.5 seconds
+        self.assertEqual(estimate, 2 + 1 + 1.5)
+
 
 @override_settings(SELENIUM_WEBDRIVERS=False)
 class DjangoSeleniumCleanSkipTestCase(TestCase):
@@ -2,4 +2,8 @@ from django.urls import path
 
 from . import views
 
-urlpatterns = [path("", views.simple_view)]
+urlpatterns = [
+    path("", views.simple_view),
+    path("slow/", views.slow_view),
+    path("form/", views.form_view),
+]
@@ -1,5 +1,18 @@
+import time
+
+from django.http import HttpResponse
 from django.shortcuts import render
 
 
 def simple_view(request):
     return render(request, "page.html")
+
+
+def form_view(request):
+    posted = sorted((name, value) for name, value in request.POST.items())
+    return render(request, "form.html", {"posted": posted})
+
+
+def slow_view(request):
+    time.sleep(0.5)
+    return HttpResponse("Done slowly")